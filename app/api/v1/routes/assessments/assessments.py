@@ -1,6 +1,7 @@
 # Standard library imports
 import json
 import logging
+import re
 import uuid
 from datetime import datetime, timezone
 from typing import List, Optional, Literal
@@ -23,7 +24,10 @@ from app.models.submission import Submission as SubmissionModel
 from app.api.v1.routes.auth.auth import get_current_user
 from app.services.subscription_access import get_active_subscription
 from app.services.track_usage_service.handle_usage_cycle import get_or_create_usage
-from app.services.ai_service.assessment_service import generate_assessment_questions
+from app.services.ai_service.assessment_service import (
+    generate_assessment_questions,
+    parse_json_response,
+)
 from app.services.material_processing_service.gemini_helpers import (
     get_gemini_file_reference_for_material,
 )
@@ -36,6 +40,8 @@ model = get_gemini_model()
 
 # Defaults and router
 DEFAULT_MAX_QUESTIONS = settings.DEFAULT_MAX_QUESTIONS
+# First number in a model-reported score such as "7/10" or "Score: 8.5"
+_SCORE_NUMBER_RE = re.compile(r"(\d+(?:\.\d+)?)")
 router = APIRouter(prefix="/assessments", tags=["assessments"])
 
 
@@ -585,7 +591,6 @@ Instructions:
 
             def _normalize_score(raw_val) -> str:
                 """Normalize score to 'X/10' string with X in [0,10]."""
-                import re as _re
                 try:
                     if isinstance(raw_val, (int, float)):
                         x = int(round(float(raw_val)))
@@ -593,7 +598,7 @@ Instructions:
                         return f"{x}/10"
                     s = str(raw_val).strip()
                     # Extract first number
-                    m = _re.search(r"(\d+(?:\.\d+)?)", s)
+                    m = _SCORE_NUMBER_RE.search(s)
                     if m:
                         x = int(round(float(m.group(1))))
                         x = max(0, min(10, x))
@@ -603,12 +608,7 @@ Instructions:
                 return "0/10"
 
             try:
-                payload = text
-                if "```json" in text:
-                    payload = text.split("```json")[1].split("```", 1)[0].strip()
-                elif "```" in text:
-                    payload = text.split("```", 1)[1].strip()
-                parsed = json.loads(payload)
+                parsed = parse_json_response(text)
                 if isinstance(parsed, dict) and {"score", "details"}.issubset(parsed.keys()):
                     det = _clean_details(str(parsed.get("details", "")), max_words=200)
                     grading = {"score": _normalize_score(parsed.get("score")), "details": det}
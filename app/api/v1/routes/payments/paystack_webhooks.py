@@ -288,6 +288,7 @@ async def _handle_charge_success(event, db: AsyncSession, service: SubscriptionS
                             period_end=period_end,
                             manage_url=BILLING_DASHBOARD_URL,
                             provider="paystack",
+                            invoice_id=reference,
                         )
                     else:
                         await payment_notifications.send_payment_success_email(
@@ -301,6 +302,7 @@ async def _handle_charge_success(event, db: AsyncSession, service: SubscriptionS
                             period_end=period_end,
                             manage_url=BILLING_DASHBOARD_URL,
                             provider="paystack",
+                            invoice_id=reference,
                         )
                 except EmailError as exc:
                     logger.error("Failed to send Paystack renewal email for subscription %s: %s", sub.id, exc)
@@ -276,6 +276,7 @@ async def _handle_invoice_paid(event, db: AsyncSession, service: SubscriptionSer
                     period_end=period_end,
                     manage_url=BILLING_DASHBOARD_URL,
                     provider="stripe",
+                    invoice_id=invoice.get("id"),
                 )
             else:
                 await payment_notifications.send_payment_success_email(
@@ -289,6 +290,7 @@ async def _handle_invoice_paid(event, db: AsyncSession, service: SubscriptionSer
                     period_end=period_end,
                     manage_url=BILLING_DASHBOARD_URL,
                     provider="stripe",
+                    invoice_id=invoice.get("id"),
                 )
         except EmailError as exc:
             logger.error("Failed to send Stripe renewal email for subscription %s: %s", sub.id, exc)
@@ -362,6 +364,7 @@ async def _handle_invoice_payment_failed(event, db: AsyncSession, service: Subsc
                 next_retry_date=next_retry_date,
                 update_payment_url=update_payment_url,
                 provider="stripe",
+                invoice_id=invoice.get("id"),
             )
         except EmailError as exc:
             logger.error("Failed to send Stripe payment failure email for subscription %s: %s", sub.id, exc)
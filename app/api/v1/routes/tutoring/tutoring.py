@@ -1,5 +1,6 @@
 # Standard library imports
 import logging
+import re
 import uuid
 from typing import Optional, List, Literal
 
@@ -29,6 +30,9 @@ logger = logging.getLogger(__name__)
 # Create router
 router = APIRouter(prefix="/questions", tags=["tutoring"])
 
+# Sentence boundary used to cut the hint down to the first two sentences
+_SENTENCE_SPLIT_RE = re.compile(r"(?<=[.!?])\s+")
+
 
 # Data models
 class QuestionRequest(BaseModel):
@@ -189,8 +193,7 @@ async def get_chat_hint(
         para.append(ln)
     
     first_para = " ".join(para).strip()
-    import re
-    sentences = re.split(r"(?<=[.!?])\s+", first_para) if first_para else []
+    sentences = _SENTENCE_SPLIT_RE.split(first_para, maxsplit=2) if first_para else []
     hint = " ".join(sentences[:2]) if sentences else "Explore the core ideas presented in this material."
 
     return success_response(
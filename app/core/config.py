@@ -15,6 +15,7 @@ class Settings(BaseSettings):
     # Core application settings
     DATABASE_URL: str
     GOOGLE_API_KEY: str
+    GEMINI_MAX_CONCURRENCY: int = 16  # in-flight tutor Gemini calls per worker
     HOST: str = "0.0.0.0"
     PORT: int = 8101
     DEBUG: bool = False
@@ -32,6 +33,12 @@ class Settings(BaseSettings):
     # Assessment settings
     DEFAULT_MAX_QUESTIONS: int = 5
 
+    # AI tutor response cache
+    TUTOR_CACHE_MAX: int = 2048
+    TUTOR_CACHE_TTL: int = 3600  # seconds
+    # Send the tutor math-notation rules as a system instruction (False = inline in the prompt)
+    TUTOR_MATH_AS_SYSTEM_INSTRUCTION: bool = True
+
     # JWT settings
     JWT_SECRET: str
     JWT_ALGORITHM: str = "HS256"
@@ -52,6 +59,8 @@ class Settings(BaseSettings):
     RESEND_API_KEY: str
     RESEND_FROM_EMAIL: str
     SUPPORT_EMAIL: str = "support@knoledg.com"
+    # App-owned directory for compiled email templates; unset keeps them in memory only
+    JINJA_BYTECODE_CACHE_DIR: str | None = None
 
     # Payment gateway settings
     PAYSTACK_SECRET_KEY: str
@@ -86,6 +95,7 @@ class Settings(BaseSettings):
     GOTENBERG_URL: str | None = None
     GOTENBERG_TIMEOUT_SECONDS: int = 45
     GOTENBERG_MAX_FILE_SIZE_MB: int | None = 40
+    GOTENBERG_MAX_OUTPUT_SIZE_MB: int | None = None  # defaults to 2x the input limit
     GOTENBERG_SKIP_TLS_VERIFY: bool = False
     GOTENBERG_HEALTHCHECK_PATH: str = "health"
 
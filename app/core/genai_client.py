@@ -9,7 +9,8 @@ from app.core.config import settings
 # Configure logging
 logger = logging.getLogger(__name__)
 
-# Initialize Gemini API
+# Initialize Gemini API once per process. Re-running configure() discards the SDK's
+# cached clients (and their pooled gRPC channels), so other modules must not call it.
 genai.configure(api_key=settings.GOOGLE_API_KEY)
 
 DEFAULT_GEMINI_MODEL = "gemini-2.5-flash-lite"
@@ -41,9 +42,10 @@ class GeminiClientWithRetry:
         {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
     ]
     
-    def __init__(self, model_name: str = DEFAULT_GEMINI_MODEL):
+    def __init__(self, model_name: str = DEFAULT_GEMINI_MODEL, system_instruction: Optional[str] = None):
         self.model_name = model_name
-        self.model = genai.GenerativeModel(model_name)
+        self.system_instruction = system_instruction
+        self.model = genai.GenerativeModel(model_name, system_instruction=system_instruction)
         self.max_retries = 3
         self.base_delay = 1.0  # Base delay in seconds
         self.max_delay = 60.0  # Maximum delay in seconds
@@ -164,13 +166,22 @@ class GeminiClientWithRetry:
             raise Exception("AI service is temporarily unavailable. Please try again later.")
 
 
-# Global client instance
-_gemini_client: Optional[GeminiClientWithRetry] = None
+# Shared client instances, one per (model, system instruction) pair
+_gemini_clients: Dict[tuple, GeminiClientWithRetry] = {}
 
 
-def get_gemini_model() -> GeminiClientWithRetry:
-    """Return the shared Gemini client with retry/backoff handling."""
-    global _gemini_client
-    if _gemini_client is None:
-        _gemini_client = GeminiClientWithRetry()
-    return _gemini_client
+def get_gemini_model(
+    model_name: str = DEFAULT_GEMINI_MODEL,
+    system_instruction: Optional[str] = None,
+) -> GeminiClientWithRetry:
+    """Return the shared Gemini client with retry/backoff handling.
+
+    Clients are cached per ``(model_name, system_instruction)`` so static
+    instructions are bound once at construction instead of resent in every prompt.
+    """
+    key = (model_name, system_instruction)
+    client = _gemini_clients.get(key)
+    if client is None:
+        client = GeminiClientWithRetry(model_name, system_instruction=system_instruction)
+        _gemini_clients[key] = client
+    return client
@@ -15,6 +15,8 @@ from app.api.v1.routes.router import router as api_v1_router
 from app.core.config import settings
 from app.core.response import error_response, validation_error_response
 from app.db.seed.plans import seed_all
+from app.services.document_conversion import gotenberg_client
+from app.services.mail_handler_service import mailer_resend
 from app.services.payments.ttl_expirer import run_ttl_expirer_task
 
 
@@ -31,8 +33,12 @@ async def lifespan(app: FastAPI):
     try:
         ttl_task.cancel()
         await ttl_task
-    except Exception:
+    # CancelledError is a BaseException; letting it escape would skip the cleanup below
+    except (asyncio.CancelledError, Exception):
         pass
+    # Release pooled outbound HTTP connections
+    await gotenberg_client.aclose_clients()
+    await mailer_resend.aclose_client()
 
 
 # Initialize FastAPI
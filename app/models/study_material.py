@@ -20,6 +20,10 @@ class StudyMaterial(Base):
     status = Column(Enum(MaterialStatus), 
                     nullable=False, 
                     default=MaterialStatus.processing)
+    # Gemini Files reference (legacy rows keep it pipe-encoded in ``content``)
+    gemini_file_uri = Column(String, nullable=True)
+    gemini_file_expires_at = Column(DateTime(timezone=True), nullable=True, index=True)
+    gemini_file_mime_type = Column(String(255), nullable=True)
     created_at = Column(
         DateTime(timezone=True),
         server_default=func.now(),
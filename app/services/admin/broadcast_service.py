@@ -22,7 +22,7 @@ from app.schemas.admin.broadcasts import (
     BroadcastTestRequest,
 )
 from app.core.config import settings
-from app.services.mail_handler_service.mailer_resend import EmailError, send_email
+from app.services.mail_handler_service.mailer_resend import EmailError, send_batch
 from app.utils.enums import BroadcastAudienceType, BroadcastStatus
 
 
@@ -125,7 +125,10 @@ class BroadcastService:
         broadcast_id: str,
     ) -> int:
         total_sent = 0
-        for chunk in self._chunked(recipients, self.MAX_BATCH_SIZE):
+        for index, chunk in enumerate(self._chunked(recipients, self.MAX_BATCH_SIZE)):
+            # Rate limiting: Resend allows 2 requests/second; each chunk is one request
+            if index:
+                await asyncio.sleep(0.5)
             await self._deliver_batch(
                 subject=subject,
                 recipients=chunk,
@@ -143,27 +146,22 @@ class BroadcastService:
         content: PreparedBroadcastContent,
         tags: Dict[str, str],
     ) -> None:
-        """Send emails to a batch of recipients with rate limiting.
-        
-        Resend API limit: 2 requests per second.
-        Adds 500ms delay between emails to stay within limits.
-        """
-        for i, recipient in enumerate(recipients):
+        """Send a batch of personalized emails in a single Resend batch request."""
+        messages = []
+        for recipient in recipients:
             personalized_html, personalized_text = self._personalize_content(
                 recipient, content
             )
-            await send_email(
-                subject=subject,
-                recipient=[recipient],
-                html_content=personalized_html,
-                text_content=personalized_text,
-                tags=tags,
+            messages.append(
+                {
+                    "subject": subject,
+                    "recipient": [recipient],
+                    "html_content": personalized_html,
+                    "text_content": personalized_text,
+                    "tags": tags,
+                }
             )
-            
-            # Rate limiting: Resend allows 2 requests/second
-            # Add 500ms delay after each email (except the last one)
-            if i < len(recipients) - 1:
-                await asyncio.sleep(0.5)
+        await send_batch(messages)
 
     async def _resolve_recipients(self, audience: BroadcastAudience) -> List[str]:
         if audience.type == BroadcastAudienceType.custom:
@@ -2,9 +2,17 @@
 
 import json
 import logging
-from typing import Optional
+from types import MappingProxyType
+from typing import Any, Optional
 
-from app.core.genai_client import get_gemini_model
+try:
+        import orjson
+        ORJSON_AVAILABLE = True
+except ImportError:
+        orjson = None
+        ORJSON_AVAILABLE = False
+
+from app.core.genai_client import DEFAULT_MULTIMODAL_GENERATION_CONFIG, get_gemini_model
 from app.services.material_processing_service.gemini_files import (
         GeminiFileMetadata,
         generate_from_gemini_file,
@@ -13,6 +21,35 @@ from app.services.material_processing_service.gemini_files import (
 logger = logging.getLogger(__name__)
 model = get_gemini_model()
 
+def strip_json_fence(text: str) -> str:
+        """Return the JSON inside a markdown code fence, or ``text`` unchanged if unfenced.
+
+        Prefers a ```json fence, then a bare ``` one; an unclosed fence runs to the end.
+        Plain ``str.partition`` scans keep this linear on long responses.
+        """
+        if "```" not in text:
+                return text
+        _, fence, rest = text.partition("```json")
+        if not fence:
+                _, _, rest = text.partition("```")
+        body, _, _ = rest.partition("```")
+        return body.strip()
+
+
+def parse_json_response(text: str) -> Any:
+        """Parse (optionally fenced) model JSON, with orjson when installed.
+
+        Raises ``json.JSONDecodeError`` on invalid input (orjson's error subclasses it).
+        """
+        payload = strip_json_fence(text)
+        if ORJSON_AVAILABLE:
+                try:
+                        return orjson.loads(payload)
+                except orjson.JSONDecodeError:
+                        # orjson is stricter (e.g. >64-bit ints); let the stdlib have a go before failing
+                        pass
+        return json.loads(payload)
+
 CRITICAL_INSTRUCTIONS = r"""
 MATH FORMATTING (STRICT):
 - Use LaTeX for ALL math. Inline math must use single dollar signs: $...$. Display math must use double dollar signs: $$...$$.
@@ -32,6 +69,68 @@ OUTPUT HYGIENE:
 """
 
 
+# Schema-constrained JSON per operation: Gemini validates the shape server-side, so the
+# response parses directly (the fence stripping in parse_json_response is only a safety net)
+_QUESTION_ITEM_PROPERTIES = {
+        "generate_mc": {
+                "question": {"type": "string"},
+                "options": {"type": "array", "items": {"type": "string"}},
+                "correct_answer": {"type": "string"},
+                "explanation": {"type": "string"},
+        },
+        "generate_tf": {
+                "question": {"type": "string"},
+                "correct_answer": {"type": "boolean"},
+                "explanation": {"type": "string"},
+        },
+        "generate_sa": {
+                "question": {"type": "string"},
+        },
+}
+_GENERATION_CONFIGS = {
+        operation: {
+                # Keep the client's default sampling and output limits alongside the schema
+                **DEFAULT_MULTIMODAL_GENERATION_CONFIG,
+                "response_mime_type": "application/json",
+                "response_schema": {
+                        "type": "object",
+                        "properties": {
+                                "questions": {
+                                        "type": "array",
+                                        "items": {
+                                                "type": "object",
+                                                "properties": properties,
+                                                "required": list(properties),
+                                        },
+                                },
+                        },
+                        "required": ["questions"],
+                },
+        }
+        for operation, properties in _QUESTION_ITEM_PROPERTIES.items()
+}
+
+# Placeholder questions returned when the Gemini call fails, built once per operation.
+# Read-only so a caller mutating a returned question cannot corrupt the template.
+_FALLBACK_QUESTION_BASE = {"question": "Based on the study material, explain the key concepts."}
+_FALLBACK_EXPLANATION = "Fallback due to temporary issue."
+
+_FALLBACK_QUESTIONS = {
+        "generate_mc": MappingProxyType({
+                **_FALLBACK_QUESTION_BASE,
+                "options": ("Option A", "Option B", "Option C", "Option D"),
+                "correct_answer": "Option A",
+                "explanation": _FALLBACK_EXPLANATION,
+        }),
+        "generate_tf": MappingProxyType({
+                **_FALLBACK_QUESTION_BASE,
+                "correct_answer": True,
+                "explanation": _FALLBACK_EXPLANATION,
+        }),
+        "generate_sa": MappingProxyType(dict(_FALLBACK_QUESTION_BASE)),
+}
+
+
 async def generate_assessment_questions(
         text: str,
         operation_type: str,
@@ -118,31 +217,21 @@ async def generate_assessment_questions(
                                         file_uri=gemini_file.uri,
                                         prompt=prompts[operation_type],
                                         mime_type=gemini_file.mime_type or "application/pdf",
+                                        generation_config=_GENERATION_CONFIGS.get(operation_type),
                                 )
                         else:
-                                response = await model.generate_content_async(prompts[operation_type])
+                                response = await model.generate_content_async(
+                                        prompts[operation_type],
+                                        generation_config=_GENERATION_CONFIGS.get(operation_type),
+                                )
                                 response_text = response.text
                 except Exception as e:
                         logger.error(f"Error calling Gemini API in generate_assessment_questions: {str(e)}")
-                        base_q = {"question": "Based on the study material, explain the key concepts."}
-                        if operation_type == "generate_tf":
-                                base_q.update({"correct_answer": True, "explanation": "Fallback due to temporary issue."})
-                        if operation_type == "generate_mc":
-                                base_q.update({
-                                        "options": ["Option A", "Option B", "Option C", "Option D"],
-                                        "correct_answer": "Option A",
-                                        "explanation": "Fallback due to temporary issue.",
-                                })
-                        return {"questions": [base_q for _ in range(min(num_questions, 3))]}
+                        template = _FALLBACK_QUESTIONS.get(operation_type, _FALLBACK_QUESTIONS["generate_sa"])
+                        return {"questions": [dict(template) for _ in range(min(num_questions, 3))]}
 
                 try:
-                        json_str = response_text
-                        if "```json" in response_text:
-                                json_str = response_text.split("```json")[1].split("```")[0].strip()
-                        elif "```" in response_text:
-                                json_str = response_text.split("```")[1].strip()
-
-                        result = json.loads(json_str)
+                        result = parse_json_response(response_text)
 
                         if operation_type != "summarize" and "questions" not in result:
                                 raise ValueError("Response missing 'questions' key")
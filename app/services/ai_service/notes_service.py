@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+import asyncio
 import io
 import logging
 import os
@@ -278,7 +279,8 @@ async def _generate_detailed_notes_from_pdf(
 	computed_page_count: Optional[int] = page_count
 	if computed_page_count is None:
 		try:
-			computed_page_count = get_pdf_page_count_from_bytes(pdf_bytes)
+			# Parsing a large PDF's page tree can take a while; keep it off the event loop
+			computed_page_count = await asyncio.to_thread(get_pdf_page_count_from_bytes, pdf_bytes)
 		except Exception:
 			logger.warning("Falling back to unknown page count for detailed notes")
 			computed_page_count = None
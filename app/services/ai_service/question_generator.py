@@ -1,13 +1,42 @@
 """AI service for generating context-aware study questions using Gemini."""
 
+import hashlib
+import itertools
 import json
 import logging
 from typing import List
 
-from app.core.genai_client import get_gemini_model
+from app.core.genai_client import DEFAULT_MULTIMODAL_GENERATION_CONFIG, get_gemini_model
+from app.utils.token_budget import truncate_to_token_budget
+from app.utils.ttl_cache import TTLCache
 
 logger = logging.getLogger(__name__)
 
+# Generated questions keyed by (content hash, title); survives retries and re-clicks
+_QUESTIONS_CACHE: TTLCache[List[str]] = TTLCache(maxsize=1024, ttl=86400)
+
+# Generic questions used to pad a short model response up to 4
+_PADDING_QUESTIONS = [
+    "What are the main concepts covered in this material?",
+    "How do the key ideas relate to each other?",
+    "What are the practical applications of this content?",
+    "What assumptions or limitations are discussed?",
+]
+
+# Structured output: Gemini returns a bare JSON array of strings (no fences/prose)
+_QUESTIONS_GENERATION_CONFIG = {
+    **DEFAULT_MULTIMODAL_GENERATION_CONFIG,
+    "response_mime_type": "application/json",
+    "response_schema": list[str],
+}
+
+# Full tracebacks are logged for one in every N failures to keep outages cheap to log
+_TRACEBACK_SAMPLE_RATE = 100
+_failure_counter = itertools.count()
+
+# Material context budget for question generation (estimated Gemini tokens)
+MAX_CONTEXT_TOKENS = 3000
+
 
 async def generate_suggested_questions(content: str, title: str = "Material") -> List[str]:
     """Generate 4 context-aware study questions using Gemini.
@@ -19,12 +48,16 @@ async def generate_suggested_questions(content: str, title: str = "Material") ->
     Returns:
         List of exactly 4 question strings
     """
+    # Truncate content to the token budget while keeping whole paragraphs
+    truncated = truncate_to_token_budget(content, MAX_CONTEXT_TOKENS)
+
+    cache_key = (hashlib.blake2b(truncated.encode()).hexdigest(), title)
+    cached = _QUESTIONS_CACHE.get(cache_key)
+    if cached is not None:
+        return list(cached)
+
     model = get_gemini_model()
     
-    # Truncate content to avoid token limits while keeping context
-    max_chars = 8000
-    truncated = content[:max_chars] if len(content) > max_chars else content
-    
     prompt = f"""You are an expert educator. Based on this study material, generate exactly 4 thoughtful questions that encourage deeper understanding.
 
 MATERIAL TITLE: {title}
@@ -46,50 +79,26 @@ Return ONLY a JSON array of 4 strings, no other text:
 """
     
     try:
-        response = await model.generate_content_async(prompt)
-        text = (response.text or "").strip()
-        
-        # Strip markdown code fences if present
-        if text.startswith("```"):
-            text = text.strip('`')
-            if text.startswith("json"):
-                text = text[4:].strip()
-        
-        # Extract JSON array
-        start = text.find('[')
-        end = text.rfind(']')
-        if start != -1 and end != -1 and end > start:
-            text = text[start:end+1]
-        
-        questions = json.loads(text)
+        response = await model.generate_content_async(
+            prompt,
+            generation_config=_QUESTIONS_GENERATION_CONFIG.copy(),
+        )
+        questions = json.loads(response.text)
         
         # Validate
         if not isinstance(questions, list):
             raise ValueError("Response is not a list")
         
-        # Ensure exactly 4 questions
-        questions = [str(q).strip() for q in questions if q][:4]
-        
-        # Pad with generic questions if needed
-        fallbacks = [
-            "What are the main concepts covered in this material?",
-            "How do the key ideas relate to each other?",
-            "What are the practical applications of this content?",
-            "What assumptions or limitations are discussed?"
-        ]
-        
-        while len(questions) < 4:
-            questions.append(fallbacks[len(questions)])
-        
+        # Ensure exactly 4 questions, padding with generic ones if needed
+        questions = ([str(q).strip() for q in questions if q] + _PADDING_QUESTIONS)[:4]
+        _QUESTIONS_CACHE.set(cache_key, questions)
         logger.info(f"Generated {len(questions)} questions for material: {title}")
-        return questions[:4]
+        return list(questions)
         
     except Exception as e:
-        logger.error(f"Failed to generate questions: {e}", exc_info=True)
+        if next(_failure_counter) % _TRACEBACK_SAMPLE_RATE == 0:
+            logger.error("Failed to generate questions for material: %s", title, exc_info=True)
+        else:
+            logger.warning("Failed to generate questions: %s: %.200s", type(e).__name__, e)
         # Return generic fallback questions
-        return [
-            "What are the main concepts covered in this material?",
-            "How do the key ideas relate to each other?",
-            "What are the practical applications of this content?",
-            "What questions does this material raise for further study?"
-        ]
+        return list(_PADDING_QUESTIONS)
@@ -1,44 +1,90 @@
 # Standard library imports
+import asyncio
+import hashlib
 import logging
 import re
-from typing import Literal, Optional
+import textwrap
+from pathlib import Path
+from typing import Literal, Optional, TypedDict
 
 # Local imports
+from app.core.config import settings
 from app.core.genai_client import get_gemini_model
 from app.services.material_processing_service.gemini_files import (
     GeminiFileMetadata,
     generate_from_gemini_file,
 )
+from app.utils.ttl_cache import TTLCache
 
 # Initialize logger
 logger = logging.getLogger(__name__)
 
-# Initialize Gemini model
-model = get_gemini_model()
 
+class TutorAnswer(TypedDict):
+    """Response payload returned by the tutor (serialized as-is into the API ``data`` field)."""
 
-async def answer_with_file(
-    question: str,
-    tone: Literal['academic','conversational'] = 'academic',
-    gemini_file: Optional[GeminiFileMetadata] = None,
-) -> dict:
-    """Answer a question with markdown response and proper mathematical formatting
-    
-    Args:
-        question: The student's question
-        tone: Response tone (academic or conversational)
-        gemini_file_uri: Optional Gemini file URI reference (None for questions without material)
-        
-    Returns:
-        dict: Response containing the AI tutor's markdown answer
-        
-    Raises:
-        Exception: If AI service fails
-    """
+    answer: str
+
+
+# Static prompt sections live next to this module and are read once per process
+_PROMPTS_DIR = Path(__file__).resolve().parent / "prompts"
+_MATH_NOTATION_BLOCK = (_PROMPTS_DIR / "tutor_math_notation.md").read_text(encoding="utf-8").strip()
+
+# Exact-match answer cache: identical (material, tone, question) triples skip Gemini.
+# Bump _PROMPT_VERSION whenever the prompt changes so stale answers are not served.
+_PROMPT_VERSION = "v4"
+_ANSWER_CACHE: TTLCache[TutorAnswer] = TTLCache(
+    maxsize=settings.TUTOR_CACHE_MAX,
+    ttl=settings.TUTOR_CACHE_TTL,
+)
+_WHITESPACE_RE = re.compile(r"\s+")
+
+# In-flight requests by cache key; duplicates await the leader's future
+_INFLIGHT: dict[str, "asyncio.Future[Optional[TutorAnswer]]"] = {}
+
+# Caps concurrent Gemini calls so load spikes queue here instead of tripping 429 quota errors
+_gemini_semaphore = asyncio.Semaphore(settings.GEMINI_MAX_CONCURRENCY or 16)
+
+# Longest question excerpt echoed back in the fallback answer
+_PREVIEW_CHARS = 500
+
+# Session-opening greetings / identity questions get a canned intro instead of a Gemini call.
+# Anchored to the whole input so study questions starting with these phrases still get answered.
+_GREETING_ONLY_RE = re.compile(
+    r"^\s*(hi|hello|hey|yo|who\s+are\s+you|what\s+can\s+you\s+(do|help(\s+(me|with))?))\s*[!.?]*\s*$",
+    re.IGNORECASE,
+)
+_CANNED_INTRO_ACADEMIC = (
+    "Hello! I'm Knoledg's AI tutor, ready to help you explore this material. Feel free to ask a specific question, request a summary, or say what you need help understanding."
+)
+_CANNED_INTRO_CONVERSATIONAL = (
+    "Hey! 👋 I'm Knoledg's AI study buddy. I can walk you through your material, break down tricky "
+    "ideas with simple examples, or quiz you on what you've covered. What do you want to dig into?"
+)
 
-    # Build tone-specific persona
-    if tone == 'academic':
-        persona = (
+# Markdown shown when Gemini fails; only the question preview varies
+_FALLBACK_TEMPLATE = """# Technical Difficulty
+
+I apologize, but I'm experiencing technical difficulties at the moment. 
+
+## Your Question
+{question}
+
+## What I Can Tell You
+I'm here to help answer your question based on your study material.
+
+## Next Steps
+Please try asking your question again in a few moments. If the problem persists, you may want to:
+
+- **Rephrase** your question more simply
+- **Break** complex questions into smaller parts  
+- **Contact support** if the issue continues
+
+I'm here to help once the technical issue is resolved! 🤖"""
+
+
+# Tone-specific tutor personas
+_PERSONA_ACADEMIC = (
     "You are Knoledg's AI tutor. "
     
     # Dynamic conversation handling
@@ -66,123 +112,178 @@ async def answer_with_file(
     "If they're formal, be formal. If they're casual, be relaxed but educational. "
     "Always ground explanations in their provided material when possible."
 )
-    else:
-        persona = (
-        "You are Knoledg's AI study buddy - knowledgeable but super approachable. "
-        
-        # Response structure
-        "Give concise, single responses - don't repeat information in different words. "
-        "If asked who you are or what you do, answer once clearly and move on. "
-        "Avoid listing features formally - weave capabilities into natural conversation. "
-        
-        # Natural conversation style  
-        "Chat like a helpful friend who's really good at explaining things. "
-        "Use casual language naturally ('yeah', 'totally', 'here's the thing'). "
-        "One emoji per response max - don't overdo it. "
-        
-        # For introductions specifically
-        "When asked 'who are you' or 'what can you do', give ONE friendly intro that "
-        "covers both identity and capabilities in a flowing paragraph or two, not lists. "
-        "Example flow: greeting → who you are → how you help (naturally integrated). "
-        
-        # Teaching through conversation
-        "When explaining material: 'So basically...', 'Think of it like...', "
-        "'The cool thing is...'. Make analogies to everyday stuff. "
-        
-        # Stay authentic and concise
-        "Be genuinely helpful without over-explaining. If they ask something simple, "
-        "keep the answer simple. Save the detailed explanations for when they're needed. "
-        "Think 'helpful friend' not 'eager salesperson listing features'. "
-        
-        # Natural flow
-        "Let conversations breathe. Match their energy. "
-        "If they're casual, be casual. If they're focused, get to the point."
-    )
-
-    prompt = f"""
-{persona}
 
-**MATHEMATICAL NOTATION (INTERNAL):** Do not mention LaTeX or formatting; just use it.
+_PERSONA_CONVERSATIONAL = (
+    "You are Knoledg's AI study buddy - knowledgeable but super approachable. "
     
-    When including ANY mathematical content, you MUST use proper LaTeX formatting within double dollar signs ($...$):
+    # Response structure
+    "Give concise, single responses - don't repeat information in different words. "
+    "If asked who you are or what you do, answer once clearly and move on. "
+    "Avoid listing features formally - weave capabilities into natural conversation. "
     
-    **Fractions:** Always use \\frac{{numerator}}{{denominator}}
-    - Instead of: x/12 → Use: $\\frac{{x}}{{12}}$
-    - Instead of: 2x/15 → Use: $\\frac{{2x}}{{15}}$
-    - Instead of: (x+1)/2x → Use: $\\frac{{x+1}}{{2x}}$
+    # Natural conversation style  
+    "Chat like a helpful friend who's really good at explaining things. "
+    "Use casual language naturally ('yeah', 'totally', 'here's the thing'). "
+    "One emoji per response max - don't overdo it. "
     
-    **Variables and Expressions:**
-    - Single variables: $x$, $y$, $a$, $b$
-    - Expressions: $2x + 3$, $x^2 - 4$
-    - Equations: $x = \\frac{{-b \\pm \\sqrt{{b^2 - 4ac}}}}{{2a}}$
+    # For introductions specifically
+    "When asked 'who are you' or 'what can you do', give ONE friendly intro that "
+    "covers both identity and capabilities in a flowing paragraph or two, not lists. "
+    "Example flow: greeting → who you are → how you help (naturally integrated). "
     
-    **Common Mathematical Elements:**
-    - Exponents: $x^2$, $e^{{-x}}$, $2^n$
-    - Square roots: $\\sqrt{{x}}$, $\\sqrt{{x^2 + y^2}}$
-    - Subscripts: $x_1$, $a_n$, $v_0$
-    - Greek letters: $\\alpha$, $\\beta$, $\\pi$, $\\theta$
-    - Summation: $\\sum_{{i=1}}^{{n}} x_i$
-    - Integration: $\\int_0^1 f(x) dx$
-    - Limits: $\\lim_{{x \\to 0}} \\frac{{\\sin x}}{{x}}$
+    # Teaching through conversation
+    "When explaining material: 'So basically...', 'Think of it like...', "
+    "'The cool thing is...'. Make analogies to everyday stuff. "
     
-    **Complex Expressions:**
-    - Matrices: $\\begin{{pmatrix}} a & b \\\\ c & d \\end{{pmatrix}}$
-    - Systems: $\\begin{{cases}} x + y = 5 \\\\ 2x - y = 1 \\end{{cases}}$
-    - Aligned equations: $\\begin{{align}} x &= 2 \\\\ y &= 3x + 1 \\end{{align}}$
+    # Stay authentic and concise
+    "Be genuinely helpful without over-explaining. If they ask something simple, "
+    "keep the answer simple. Save the detailed explanations for when they're needed. "
+    "Think 'helpful friend' not 'eager salesperson listing features'. "
     
-    **CRITICAL RULES:**
-    - NEVER use plain text for mathematical expressions
-    - NEVER mention "LaTeX", "formatting", or any technical details to students
-    - NEVER say formulas "weren't provided in LaTeX format" or similar
-    - Simply present formulas naturally as part of your explanation
+    # Natural flow
+    "Let conversations breathe. Match their energy. "
+    "If they're casual, be casual. If they're focused, get to the point."
+)
 
-QUESTION:
-{question}
+# Persona dispatch table; unknown tones fall back to the academic persona
+_PERSONAS: dict[str, str] = {
+    "academic": _PERSONA_ACADEMIC,
+    "conversational": _PERSONA_CONVERSATIONAL,
+}
+_DEFAULT_TONE = "academic"
 
-Answer the question using markdown.
-"""
+# Static prompt scaffolding, assembled once per tone; per request only the question is spliced in.
+# (Plain concatenation rather than str.format: the LaTeX examples are full of braces.)
+# The math-notation rules normally ride along as the model's system instruction; the
+# settings flag restores in-prompt injection for models that ignore system instructions.
+if settings.TUTOR_MATH_AS_SYSTEM_INSTRUCTION:
+    _SYSTEM_INSTRUCTION: Optional[str] = _MATH_NOTATION_BLOCK
+    _PROMPT_HEADERS: dict[str, str] = {
+        tone: f"\n{persona}\n\nQUESTION:\n" for tone, persona in _PERSONAS.items()
+    }
+else:
+    _SYSTEM_INSTRUCTION = None
+    _PROMPT_HEADERS = {
+        tone: f"\n{persona}\n\n{_MATH_NOTATION_BLOCK}\n\nQUESTION:\n"
+        for tone, persona in _PERSONAS.items()
+    }
+_PROMPT_TAIL = "\n\nAnswer the question using markdown.\n"
 
-    try:
-        if gemini_file:
-            # Generate using Files API with PDF context
-            response_text = await generate_from_gemini_file(
-                file_uri=gemini_file.uri,
-                prompt=prompt,
-                mime_type=gemini_file.mime_type or "application/pdf",
-            )
-            text = response_text or ""
-        else:
-            # Generate without file context (for questions without material)
-            response = await model.generate_content_async(prompt)
-            text = response.text or ""
+
+def _preview(text: str, width: int = _PREVIEW_CHARS) -> str:
+    """Return ``text`` shortened to ``width`` characters at a word boundary."""
+    if len(text) <= width:
+        return text
+    preview = textwrap.shorten(text, width=width, placeholder="…")
+    if preview == "…":
+        # A single unbroken token (e.g. a pasted URL) leaves nothing but the placeholder
+        preview = f"{text[:width - 1]}…"
+    return preview
+
+
+def _answer_cache_key(question: str, tone: str, gemini_file: Optional[GeminiFileMetadata]) -> str:
+    """Return the versioned cache key for a (tone, material file, question) request."""
+    file_uri = gemini_file.uri if gemini_file else ""
+    normalized_question = _WHITESPACE_RE.sub(" ", question).strip().lower()
+    digest = hashlib.blake2b(
+        f"{tone}|{file_uri}|{normalized_question}".encode(),
+        digest_size=16,
+    ).hexdigest()
+    return f"{_PROMPT_VERSION}:{digest}"
+
+
+async def answer_with_file(
+    question: str,
+    tone: Literal['academic','conversational'] = 'academic',
+    gemini_file: Optional[GeminiFileMetadata] = None,
+) -> TutorAnswer:
+    """Answer a question with markdown response and proper mathematical formatting
+    
+    Args:
+        question: The student's question
+        tone: Response tone (academic or conversational)
+        gemini_file: Optional Gemini Files reference for the material (None for questions without material)
+        
+    Returns:
+        TutorAnswer: Response containing the AI tutor's markdown answer
         
-        if not text.strip():
-            text = (
-                "Hello! I'm Knoledg's AI tutor, ready to help you explore this material. Feel free to ask a specific question, request a summary, or say what you need help understanding."
-            )
+    Raises:
+        Exception: If AI service fails
+    """
 
-        return {"answer": text}
+    if not question or question.isspace() or _GREETING_ONLY_RE.match(question):
+        intro = _CANNED_INTRO_CONVERSATIONAL if tone == 'conversational' else _CANNED_INTRO_ACADEMIC
+        return TutorAnswer(answer=intro)
 
-    except Exception as e:
-        logger.error(f"Error in answer_with_file: {str(e)}")
-        # Provide a fallback markdown response
-        fallback_answer = f"""# Technical Difficulty
+    cache_key = _answer_cache_key(question, tone, gemini_file)
+    cached = _ANSWER_CACHE.get(cache_key)
+    if cached is not None:
+        return TutorAnswer(answer=cached["answer"])
 
-I apologize, but I'm experiencing technical difficulties at the moment. 
+    # Coalesce concurrent identical requests (double-clicks, client retries) onto one call
+    pending = _INFLIGHT.get(cache_key)
+    if pending is not None:
+        shared = await asyncio.shield(pending)
+        if shared is not None:
+            return TutorAnswer(answer=shared["answer"])
 
-## Your Question
-{question}
+    future: asyncio.Future = asyncio.get_running_loop().create_future()
+    _INFLIGHT[cache_key] = future
+    try:
+        result = await _answer_uncached(question, tone, gemini_file, cache_key)
+        future.set_result(result)
+        return result
+    finally:
+        if not future.done():
+            # Leader was cancelled: let waiters fall back to their own call
+            future.set_result(None)
+        if _INFLIGHT.get(cache_key) is future:
+            del _INFLIGHT[cache_key]
 
-## What I Can Tell You
-I'm here to help answer your question based on your study material.
 
-## Next Steps
-Please try asking your question again in a few moments. If the problem persists, you may want to:
+async def _answer_uncached(
+    question: str,
+    tone: str,
+    gemini_file: Optional[GeminiFileMetadata],
+    cache_key: str,
+) -> TutorAnswer:
+    """Build the tutor prompt and call Gemini, caching successful answers."""
 
-- **Rephrase** your question more simply
-- **Break** complex questions into smaller parts  
-- **Contact support** if the issue continues
+    # The static header always leads the request so Gemini's implicit prefix cache
+    # can reuse it; only the question tail differs between students.
+    header = _PROMPT_HEADERS.get(tone) or _PROMPT_HEADERS[_DEFAULT_TONE]
+    question_tail = question + _PROMPT_TAIL
 
-I'm here to help once the technical issue is resolved! 🤖"""
-        
-        return {"answer": fallback_answer}
+    try:
+        if gemini_file:
+            # Generate using Files API with PDF context: [header, file, question] keeps
+            # the header + material prefix identical for every question on that file
+            async with _gemini_semaphore:
+                response_text = await generate_from_gemini_file(
+                    file_uri=gemini_file.uri,
+                    prompt=header,
+                    trailing_prompt=question_tail,
+                    system_instruction=_SYSTEM_INSTRUCTION,
+                    mime_type=gemini_file.mime_type or "application/pdf",
+                )
+            text = response_text or ""
+        else:
+            # Generate without file context (for questions without material)
+            model = get_gemini_model(system_instruction=_SYSTEM_INSTRUCTION)
+            async with _gemini_semaphore:
+                # Separate parts: the static header string is sent as-is, never re-joined
+                response = await model.generate_content_async([header, question_tail])
+            text = (response.text if response is not None else None) or ""
+
+        # isspace() short-circuits on the first visible character instead of copying the answer
+        if not text or text.isspace():
+            text = _CANNED_INTRO_ACADEMIC
+        else:
+            _ANSWER_CACHE.set(cache_key, TutorAnswer(answer=text))
+
+        return TutorAnswer(answer=text)
+
+    except Exception as e:
+        logger.error("Error in answer_with_file: %s", e, exc_info=True)
+        # Provide a fallback markdown response (echo at most a short preview of the question)
+        return TutorAnswer(answer=_FALLBACK_TEMPLATE.format(question=_preview(question)))
@@ -1,8 +1,10 @@
 from __future__ import annotations
 
+import asyncio
+import io
 import logging
-import mimetypes
 import os
+import time
 from dataclasses import dataclass
 from typing import Optional
 
@@ -34,32 +36,105 @@ class GotenbergConversionResult:
     content_type: str
 
 
-_OFFICE_MIME_OVERRIDES = {
+# Extensions we send to LibreOffice; anything else goes up as an opaque octet-stream
+_EXT_TO_MIME = {
     ".doc": "application/msword",
     ".docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    ".odt": "application/vnd.oasis.opendocument.text",
+    ".rtf": "application/rtf",
+    ".xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    ".pptx": "application/vnd.openxmlformats-officedocument.presentationml.presentation",
+    ".txt": "text/plain",
 }
+_DEFAULT_MIME = "application/octet-stream"
+
+
+# Pooled clients keyed by (timeout, verify) so keep-alive connections survive between
+# conversions instead of paying a fresh TCP/TLS handshake per request.
+_CLIENT_LIMITS = httpx.Limits(max_connections=50, max_keepalive_connections=20)
+_clients: dict[tuple[float, bool], httpx.AsyncClient] = {}
+
+
+def _get_client(request_timeout: float, verify: bool) -> httpx.AsyncClient:
+    """Return the shared AsyncClient for these settings, creating it on first use."""
+    key = (request_timeout, verify)
+    client = _clients.get(key)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(timeout=request_timeout, verify=verify, limits=_CLIENT_LIMITS)
+        _clients[key] = client
+    return client
+
+
+async def aclose_clients() -> None:
+    """Close every pooled Gotenberg client (called on application shutdown)."""
+    clients = list(_clients.values())
+    _clients.clear()
+    for client in clients:
+        await client.aclose()
+
+
+# Last healthcheck outcome as (monotonic timestamp, healthy); probes inside the TTL reuse it
+_HEALTH_TTL_SECONDS = 5.0
+_healthcheck_cache: Optional[tuple[float, bool]] = None
+_healthcheck_lock = asyncio.Lock()
+
+
+@dataclass(frozen=True)
+class _GotenbergConfig:
+    """Snapshot of the GOTENBERG_* settings, resolved once at import time."""
+
+    base_url: Optional[str]
+    max_file_size_mb: Optional[int]
+    max_bytes: Optional[int]
+    max_output_bytes: Optional[int]
+    timeout: float
+    verify: bool
+    health_url: Optional[str]
+
+
+def _load_config() -> _GotenbergConfig:
+    base_url = (settings.GOTENBERG_URL or "").rstrip("/") or None
+    max_file_mb = settings.GOTENBERG_MAX_FILE_SIZE_MB
+    # Converted PDFs are capped separately; by default at twice the input limit
+    max_output_mb = settings.GOTENBERG_MAX_OUTPUT_SIZE_MB
+    if max_output_mb is None and max_file_mb is not None:
+        max_output_mb = max_file_mb * 2
+    health_path = settings.GOTENBERG_HEALTHCHECK_PATH.strip("/")
+    health_url = None
+    if base_url:
+        health_url = f"{base_url}/{health_path}" if health_path else base_url
+    return _GotenbergConfig(
+        base_url=base_url,
+        max_file_size_mb=max_file_mb,
+        max_bytes=None if max_file_mb is None else max_file_mb * 1024 * 1024,
+        max_output_bytes=None if max_output_mb is None else max_output_mb * 1024 * 1024,
+        timeout=settings.GOTENBERG_TIMEOUT_SECONDS,
+        verify=not settings.GOTENBERG_SKIP_TLS_VERIFY,
+        health_url=health_url,
+    )
+
+
+_CFG = _load_config()
 
 
 def _resolve_base_url() -> str:
-    base_url = settings.GOTENBERG_URL
-    if not base_url:
+    if not _CFG.base_url:
         raise GotenbergNotConfigured("GOTENBERG_URL is not configured.")
-    return base_url.rstrip("/")
+    return _CFG.base_url
 
 
 def _resolve_mime_type(filename: str) -> str:
-    ext = os.path.splitext(filename or "")[1].lower()
-    return _OFFICE_MIME_OVERRIDES.get(ext) or mimetypes.guess_type(filename or "")[0] or "application/octet-stream"
+    name = filename or ""
+    dot = name.rfind(".")
+    if dot < 0:
+        return _DEFAULT_MIME
+    return _EXT_TO_MIME.get(name[dot:].lower(), _DEFAULT_MIME)
 
 
 def _ensure_size_allowed(payload: bytes) -> None:
-    limit_mb = settings.GOTENBERG_MAX_FILE_SIZE_MB
-    if limit_mb is None:
-        return
-    max_bytes = limit_mb * 1024 * 1024
-    if len(payload) > max_bytes:
+    if _CFG.max_bytes is not None and len(payload) > _CFG.max_bytes:
         raise GotenbergConversionError(
-            f"Document exceeds maximum allowed size of {limit_mb}MB for conversion."
+            f"Document exceeds maximum allowed size of {_CFG.max_file_size_mb}MB for conversion."
         )
 
 
@@ -81,58 +156,80 @@ async def convert_office_document_to_pdf(
 
     _ensure_size_allowed(document_bytes)
     base_url = _resolve_base_url()
-    request_timeout = timeout or settings.GOTENBERG_TIMEOUT_SECONDS
-    verify = not settings.GOTENBERG_SKIP_TLS_VERIFY
+    request_timeout = timeout or _CFG.timeout
 
+    # A file object (rather than raw bytes) lets httpx stream the multipart body in
+    # chunks instead of materialising another full copy of the document.
     files = {
-        "files": (filename or "document", document_bytes, _resolve_mime_type(filename)),
+        "files": (filename or "document", io.BytesIO(document_bytes), _resolve_mime_type(filename)),
     }
     data = {"output": _resolved_pdf_filename(filename)}
 
     url = f"{base_url}/forms/libreoffice/convert"
+    max_output_bytes = _CFG.max_output_bytes
+    buffer = io.BytesIO()
     try:
-        async with httpx.AsyncClient(timeout=request_timeout, verify=verify) as client:
-            response = await client.post(url, files=files, data=data)
+        client = _get_client(request_timeout, _CFG.verify)
+        # Stream the PDF back so an oversized/runaway response is cut off instead of buffered whole
+        async with client.stream("POST", url, files=files, data=data) as response:
+            if response.status_code >= 400:
+                snippet = (await response.aread())[:200].decode("utf-8", errors="replace")
+                logger.error("Gotenberg returned %s: %s", response.status_code, snippet)
+                raise GotenbergConversionError(
+                    f"Gotenberg responded with status {response.status_code}."
+                )
+
+            async for chunk in response.aiter_bytes(65536):
+                buffer.write(chunk)
+                if max_output_bytes is not None and buffer.tell() > max_output_bytes:
+                    logger.error("Gotenberg output exceeded %s bytes; aborting", max_output_bytes)
+                    raise GotenbergConversionError("Converted document exceeds the maximum allowed size.")
+
+            content_type = response.headers.get("content-type", "application/pdf")
+            output_name = (
+                response.headers.get("x-gotenberg-output-filename")
+                or _resolved_pdf_filename(filename)
+            )
     except httpx.HTTPError as exc:
-        logger.error("Gotenberg conversion request failed: %s", exc)
+        logger.error("Gotenberg conversion request failed: %s", exc, exc_info=True)
         raise GotenbergConversionError("Conversion request failed.") from exc
 
-    if response.status_code >= 400:
-        snippet = response.text[:200]
-        logger.error("Gotenberg returned %s: %s", response.status_code, snippet)
-        raise GotenbergConversionError(
-            f"Gotenberg responded with status {response.status_code}."
-        )
-
-    content_type = response.headers.get("content-type", "application/pdf")
-    output_name = (
-        response.headers.get("x-gotenberg-output-filename")
-        or _resolved_pdf_filename(filename)
-    )
-
     return GotenbergConversionResult(
-        content=response.content,
+        content=buffer.getvalue(),
         filename=output_name,
         content_type=content_type,
     )
 
 
 async def healthcheck(timeout: Optional[float] = None) -> bool:
-    """Check whether the Gotenberg endpoint is reachable."""
+    """Check whether the Gotenberg endpoint is reachable (cached for a few seconds)."""
 
-    try:
-        base_url = _resolve_base_url()
-    except GotenbergNotConfigured:
+    global _healthcheck_cache
+
+    if not _CFG.health_url:
         return False
 
-    health_path = settings.GOTENBERG_HEALTHCHECK_PATH.strip("/")
-    url = f"{base_url}/{health_path}" if health_path else base_url
-    request_timeout = timeout or settings.GOTENBERG_TIMEOUT_SECONDS
-    verify = not settings.GOTENBERG_SKIP_TLS_VERIFY
+    cached = _healthcheck_cache
+    if cached is not None and time.monotonic() - cached[0] < _HEALTH_TTL_SECONDS:
+        return cached[1]
+
+    async with _healthcheck_lock:
+        # Another probe may have refreshed the result while we waited for the lock
+        cached = _healthcheck_cache
+        if cached is not None and time.monotonic() - cached[0] < _HEALTH_TTL_SECONDS:
+            return cached[1]
+
+        healthy = await _probe(timeout)
+        _healthcheck_cache = (time.monotonic(), healthy)
+        return healthy
+
+
+async def _probe(timeout: Optional[float]) -> bool:
+    """Issue the actual GET against the Gotenberg health endpoint."""
 
     try:
-        async with httpx.AsyncClient(timeout=request_timeout, verify=verify) as client:
-            response = await client.get(url)
+        client = _get_client(timeout or _CFG.timeout, _CFG.verify)
+        response = await client.get(_CFG.health_url)
         return response.status_code < 500
     except httpx.HTTPError:
         return False
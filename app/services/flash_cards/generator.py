@@ -1,14 +1,28 @@
+import hashlib
 import json
 import logging
 import re
+from itertools import islice
 from typing import List, Dict, Any, Optional
 
-from app.core.genai_client import get_gemini_model
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+
+from app.core.genai_client import (
+    DEFAULT_GEMINI_MODEL,
+    DEFAULT_MULTIMODAL_GENERATION_CONFIG,
+    get_gemini_model,
+)
 from app.models.assessment_session import Difficulty
 from app.services.material_processing_service.gemini_files import (
     GeminiFileMetadata,
     generate_from_gemini_file,
 )
+from app.utils.ttl_cache import TTLCache
 
 logger = logging.getLogger(__name__)
 
@@ -31,6 +45,123 @@ SYSTEM_INSTRUCTIONS = (
 )
 
 
+# Flash cards are short structured output: low temperature JSON on the Flash-Lite model,
+# with the output budget sized to the number of cards requested.
+_FLASH_CARD_MODEL = DEFAULT_GEMINI_MODEL
+_FLASH_CARD_GENERATION_CONFIG: Dict[str, Any] = {
+    **DEFAULT_MULTIMODAL_GENERATION_CONFIG,
+    "temperature": 0.2,
+    "top_p": 0.9,
+    "response_mime_type": "application/json",
+    "response_schema": {
+        "type": "object",
+        "properties": {
+            "title": {"type": "string"},
+            "topic": {"type": "string", "nullable": True},
+            "difficulty": {"type": "string"},
+            "cards": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "prompt": {"type": "string"},
+                        "correspondingInformation": {"type": "string"},
+                        "hint": {"type": "string"},
+                    },
+                    "required": ["prompt", "correspondingInformation", "hint"],
+                },
+            },
+        },
+        "required": ["title", "difficulty", "cards"],
+    },
+}
+# Schema-constrained output parses on the first try; one regeneration covers truncation
+_MAX_PARSE_ATTEMPTS = 2
+_OUTPUT_TOKENS_PER_CARD = 300  # prompt + 2-6 sentence answer + hint, JSON-encoded
+_OUTPUT_TOKENS_OVERHEAD = 256  # title/topic/difficulty envelope
+_MAX_OUTPUT_TOKENS = 8192
+
+
+# Exact-match cache of generated decks keyed by (material file, title, topic, difficulty, count).
+# Kept only long enough to absorb double-submits: asking again later means the user wants
+# a fresh deck, not the same cards back.
+_DECK_CACHE_TTL = 60  # seconds
+_DECK_CACHE: TTLCache[Dict[str, Any]] = TTLCache(maxsize=512, ttl=_DECK_CACHE_TTL)
+
+_SENTENCE_SPLIT_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+def _generation_config(num_cards: int) -> Dict[str, Any]:
+    config = _FLASH_CARD_GENERATION_CONFIG.copy()
+    config["max_output_tokens"] = min(
+        _MAX_OUTPUT_TOKENS,
+        _OUTPUT_TOKENS_OVERHEAD + _OUTPUT_TOKENS_PER_CARD * max(num_cards, 1),
+    )
+    return config
+
+
+def _loads(text: str) -> Any:
+    """Parse model JSON with orjson when installed, falling back to the stdlib parser."""
+    if ORJSON_AVAILABLE:
+        try:
+            # orjson reads str (or bytes) directly; no intermediate encode copy
+            return orjson.loads(text)
+        except orjson.JSONDecodeError:
+            # orjson is stricter (e.g. >64-bit ints); let the stdlib have a go before failing
+            pass
+    return json.loads(text)
+
+
+def _deck_cache_key(
+    gemini_file: Optional[GeminiFileMetadata],
+    title: str,
+    topic: Optional[str],
+    difficulty: Difficulty,
+    num_cards: int,
+) -> str:
+    source = gemini_file.uri if gemini_file else ""
+    digest = hashlib.blake2b(
+        f"{source}|{title}|{topic or ''}".encode(), digest_size=16
+    ).hexdigest()
+    return f"{digest}:{difficulty}:{num_cards}"
+
+
+def _copy_deck(deck: Dict[str, Any]) -> Dict[str, Any]:
+    return {**deck, "cards": [dict(card) for card in deck["cards"]]}
+
+
+def _extract_json_span(text: str) -> Optional[str]:
+    """Return the first balanced ``{...}`` object in ``text`` using one forward pass.
+
+    Braces inside JSON strings (and escaped quotes) are skipped, so answers that mention
+    ``{`` or ``}`` do not end the span early. Returns None if no complete object exists.
+    """
+    start = text.find("{")
+    if start < 0:
+        return None
+    depth = 0
+    in_string = False
+    escaped = False
+    for index in range(start, len(text)):
+        char = text[index]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth == 0:
+                return text[start:index + 1]
+    return None
+
+
 def _coerce_list(obj: Any) -> List[Any]:
     if isinstance(obj, list):
         return obj
@@ -40,32 +171,83 @@ def _coerce_list(obj: Any) -> List[Any]:
 
 
 def _first_sentence(text: str) -> str:
-    parts = re.split(r"(?<=[.!?])\s+", text.strip()) if text else []
-    return parts[0] if parts else ""
-
-
-def _normalize_cards(raw_cards: Any) -> List[Dict[str, Any]]:
-    cards: List[Dict[str, Any]] = []
-    for item in _coerce_list(raw_cards):
-        if not isinstance(item, dict):
-            continue
-        prompt = str(item.get("prompt", "")).strip()
-        info = str(item.get("correspondingInformation", "")).strip()
-        hint = item.get("hint")
-        if hint is not None:
-            hint = str(hint).strip() or None
-
-        if prompt and info:
-            # Fallback hint if missing/empty: derive from first sentence of info, else from prompt
-            if not hint:
-                candidate = _first_sentence(info) or prompt
-                hint = (candidate[:100]).strip()
-            cards.append({
-                "prompt": prompt[:160],
-                "correspondingInformation": info,
-                "hint": hint
-            })
-    return cards
+    if not text:
+        return ""
+    # maxsplit=1: only the first sentence is needed, so don't split the rest
+    return _SENTENCE_SPLIT_RE.split(text.strip(), maxsplit=1)[0]
+
+
+def _normalize_card(item: Any) -> Optional[Dict[str, Any]]:
+    """Return a cleaned card dict, or None when the item lacks a prompt or information."""
+    if not isinstance(item, dict):
+        return None
+    get = item.get
+    prompt = str(get("prompt", "")).strip()
+    info = str(get("correspondingInformation", "")).strip()
+    if not (prompt and info):
+        return None
+
+    hint = get("hint")
+    if hint is not None:
+        hint = str(hint).strip() or None
+    # Fallback hint if missing/empty: derive from first sentence of info, else from prompt
+    if not hint:
+        candidate = _first_sentence(info) or prompt
+        hint = (candidate[:100]).strip()
+    return {
+        "prompt": prompt[:160],
+        "correspondingInformation": info,
+        "hint": hint
+    }
+
+
+def _normalize_cards(raw_cards: Any, limit: int) -> List[Dict[str, Any]]:
+    """Return up to ``limit`` valid cards; stops scanning once enough are collected."""
+    valid = filter(None, map(_normalize_card, _coerce_list(raw_cards)))
+    return list(islice(valid, max(limit, 0)))
+
+
+def _parse_response(
+    text: str,
+    default_title: str,
+    default_difficulty: Difficulty,
+    limit: int,
+) -> Dict[str, Any]:
+    """Decode and validate a model response into a deck of at most ``limit`` cards.
+
+    Raises json.JSONDecodeError when no JSON object can be recovered (the caller may
+    regenerate), and ValueError when the payload is valid JSON but unusable.
+    """
+    try:
+        data = _loads(text)
+    except json.JSONDecodeError:
+        # Salvage an object wrapped in stray prose/fences before paying for another call
+        span = _extract_json_span(text)
+        if span is None or span == text:
+            raise
+        data = _loads(span)
+
+    if not isinstance(data, dict):
+        raise ValueError("Generated flash cards payload is not a JSON object")
+
+    title = str(data.get("title") or default_title).strip() or default_title
+    out_topic = data.get("topic")
+    if out_topic is not None:
+        out_topic = str(out_topic).strip() or None
+    out_difficulty = str(data.get("difficulty") or default_difficulty)
+    if out_difficulty not in {"easy","medium","hard"}:
+        out_difficulty = default_difficulty
+
+    cards = _normalize_cards(data.get("cards"), limit)
+    if len(cards) < 3:
+        raise ValueError("Generated too few valid cards from file")
+
+    return {
+        "title": title,
+        "topic": out_topic,
+        "difficulty": out_difficulty,
+        "cards": cards,
+    }
 
 
 async def generate_flash_cards_from_file(
@@ -78,70 +260,52 @@ async def generate_flash_cards_from_file(
 ) -> Dict[str, Any]:
     """
     Generate flash cards from a Gemini file URI or standalone if no file provided.
-    Uses the same prompt structure and parsing as generate_flash_cards_from_context.
+    Both paths share one prompt and one parser (``_parse_response``).
     """
     user_title = material_title or "Flash Cards"
-    
-    # Build prompt (same structure as context-based)
-    prompt_text = f"""{SYSTEM_INSTRUCTIONS}
 
-Create {num_cards} flash cards at {difficulty} difficulty.
+    cache_key = _deck_cache_key(gemini_file, user_title, topic, difficulty, num_cards)
+    cached = _DECK_CACHE.get(cache_key)
+    if cached is not None:
+        return _copy_deck(cached)
+    
+    # Build the per-request prompt; SYSTEM_INSTRUCTIONS is bound to the model as its
+    # system instruction, so this identical prefix is not resent with every request.
+    prompt_text = f"""Create {num_cards} flash cards at {difficulty} difficulty.
 Title (if helpful): {user_title}.
 Topic: {topic or 'general'}.
 """
     
+    generation_config = _generation_config(num_cards)
     if gemini_file:
         prompt_text += "Use the attached study material to ensure accuracy and specificity."
-
-        response_text = await generate_from_gemini_file(
-            file_uri=gemini_file.uri,
-            prompt=prompt_text,
-            mime_type=gemini_file.mime_type or "application/pdf",
-        )
     else:
         # Generate without file context (for manual/topic-based cards)
         prompt_text += f"Create general flash cards on the topic: {topic or user_title}."
-        model = get_gemini_model()
-        response = await model.generate_content_async(prompt_text)
-        response_text = response.text
-    
-    text = response_text.strip()
-    
-    # Strip code fences or markdown if present (same logic as context-based)
-    if text.startswith("```"):
-        text = text.strip('`')
-        start = text.find('{')
-        end = text.rfind('}')
-        if start != -1 and end != -1 and end > start:
-            text = text[start:end+1]
 
-    try:
-        data = json.loads(text)
-    except Exception:
-        # Fallback: try to extract a JSON object
-        start = text.find('{')
-        end = text.rfind('}')
-        if start != -1 and end != -1 and end > start:
-            data = json.loads(text[start:end+1])
+    deck: Dict[str, Any] = {}
+    for attempt in range(1, _MAX_PARSE_ATTEMPTS + 1):
+        if gemini_file:
+            response_text = await generate_from_gemini_file(
+                file_uri=gemini_file.uri,
+                prompt=prompt_text,
+                mime_type=gemini_file.mime_type or "application/pdf",
+                generation_config=generation_config,
+                system_instruction=SYSTEM_INSTRUCTIONS,
+            )
         else:
-            logger.error("Failed to parse generated flash cards JSON from file")
-            raise
+            model = get_gemini_model(_FLASH_CARD_MODEL, system_instruction=SYSTEM_INSTRUCTIONS)
+            response = await model.generate_content_async(prompt_text, generation_config=generation_config)
+            response_text = response.text
 
-    title = str(data.get("title") or user_title).strip() or user_title
-    out_topic = data.get("topic")
-    if out_topic is not None:
-        out_topic = str(out_topic).strip() or None
-    out_difficulty = str(data.get("difficulty") or difficulty)
-    if out_difficulty not in {"easy","medium","hard"}:
-        out_difficulty = difficulty
+        try:
+            deck = _parse_response(response_text, user_title, difficulty, num_cards)
+            break
+        except json.JSONDecodeError:
+            if attempt == _MAX_PARSE_ATTEMPTS:
+                logger.error("Failed to parse generated flash cards JSON from file")
+                raise
+            logger.warning("Flash card JSON did not parse (attempt %s); regenerating", attempt)
 
-    cards = _normalize_cards(data.get("cards"))
-    if len(cards) < 3:
-        raise ValueError("Generated too few valid cards from file")
-
-    return {
-        "title": title,
-        "topic": out_topic,
-        "difficulty": out_difficulty,
-        "cards": cards[: num_cards],
-    }
+    _DECK_CACHE.set(cache_key, deck)
+    return _copy_deck(deck)
@@ -1,7 +1,8 @@
 import os
 import aiosmtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+from email.message import EmailMessage
+from email.policy import SMTP as SMTP_POLICY
+from email.utils import formataddr
 from jinja2 import Environment, FileSystemLoader, select_autoescape
 
 from app.core.config import settings
@@ -11,8 +12,34 @@ TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), "templates")
 env = Environment(
     loader=FileSystemLoader(TEMPLATE_DIR),
     autoescape=select_autoescape(["html", "xml"]),
+    # Templates only change on deploy; skip the per-render mtime check outside DEBUG
+    auto_reload=settings.DEBUG,
+    cache_size=400,
 )
 
+APP_NAME = "AI Study Assistant"
+FROM_ADDR = formataddr((APP_NAME, settings.FROM_EMAIL))
+
+# UTF-8 bodies sent as 8bit: skips the quoted-printable/base64 pass over every HTML body
+# (aiosmtplib negotiates 8BITMIME with the server and re-encodes if it is unsupported).
+_MAX_8BIT_LINE = 998  # RFC 5322 line limit; longer lines must be quoted-printable
+
+
+def _body_cte(content: str) -> str:
+    """Use 8bit unless a line is too long to be sent unencoded."""
+    if len(content) <= _MAX_8BIT_LINE:
+        return "8bit"
+    longest = max(len(line) for line in content.splitlines())
+    return "8bit" if longest <= _MAX_8BIT_LINE else "quoted-printable"
+
+# Plain-text bodies, parsed once and filled with str.format_map per send
+_VERIFY_TEXT_FMT = "Your verification code is {code}. It expires in 10 minutes.\n\nVerify at: {url}"
+_RESET_TEXT_FMT = "Your password reset code is {code}. It expires in 10 minutes."
+
+# Resolve templates once at import instead of on every send
+VERIFICATION_TPL = env.get_template("verification.html")
+RESET_TPL = env.get_template("reset_password.html")
+
 
 async def send_email(
     subject: str,
@@ -24,21 +51,21 @@ async def send_email(
     """
     Send an email via your SMTP server with proper Unicode handling.
     """
-    # Use MIMEMultipart for better encoding support
-    msg = MIMEMultipart("alternative")
-    msg["From"] = settings.FROM_EMAIL
+    # EmailMessage + SMTP policy: headers are encoded once by the modern email API and the
+    # text/html alternatives are built without the legacy MIMEMultipart/MIMEText layers
+    msg = EmailMessage(policy=SMTP_POLICY)
+    msg["From"] = FROM_ADDR
     msg["To"] = recipient
     msg["Subject"] = subject
 
-    # Add text part first (as fallback)
-    if text_content:
-        msg.attach(MIMEText(text_content, "plain", "utf-8"))
-    elif body:
-        msg.attach(MIMEText(body, "plain", "utf-8"))
-
-    # Add HTML part if provided
-    if html_content:
-        msg.attach(MIMEText(html_content, "html", "utf-8"))
+    # Text part first (as fallback), HTML as the preferred alternative
+    plain = text_content or body
+    if plain:
+        msg.set_content(plain, cte=_body_cte(plain))
+        if html_content:
+            msg.add_alternative(html_content, subtype="html", cte=_body_cte(html_content))
+    elif html_content:
+        msg.set_content(html_content, subtype="html", cte=_body_cte(html_content))
 
     await aiosmtplib.send(
         msg,
@@ -52,19 +79,17 @@ async def send_email(
 
 async def send_verification_email(email: str, code: str):
     from urllib.parse import urlencode
-
-    tpl = env.get_template("verification.html")
     frontend_base = settings.FRONTEND_APP_URL or settings.APP_URL
     if not frontend_base:
         raise ValueError("FRONTEND_APP_URL is not configured")
     verify_url = f"{frontend_base.rstrip('/')}/verify-email?{urlencode({'email': email})}"
-    html = tpl.render(
+    html = VERIFICATION_TPL.render(
         code=code,
         verify_url=verify_url,
-        app_name="AI Study Assistant",
+        app_name=APP_NAME,
         support_email=settings.FROM_EMAIL
     )
-    text = f"Your verification code is {code}. It expires in 10 minutes.\n\nVerify at: {verify_url}"
+    text = _VERIFY_TEXT_FMT.format_map({"code": code, "url": verify_url})
     await send_email(
         subject="Verify your AI Study Assistant account",
         recipient=email,
@@ -74,11 +99,10 @@ async def send_verification_email(email: str, code: str):
 
 
 async def send_reset_password_email(email: str, code: str):
-    tpl = env.get_template("reset_password.html")
-    html = tpl.render(
-        code=code, app_name="AI Study Assistant", support_email=settings.FROM_EMAIL
+    html = RESET_TPL.render(
+        code=code, app_name=APP_NAME, support_email=settings.FROM_EMAIL
     )
-    text = f"Your password reset code is {code}. It expires in 10 minutes."
+    text = _RESET_TEXT_FMT.format_map({"code": code})
     await send_email(
         subject="Reset your AI Study Assistant password",
         recipient=email,
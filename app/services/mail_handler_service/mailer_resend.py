@@ -1,18 +1,100 @@
+import asyncio
 import os
-from typing import Optional, List, Union, Dict, Any
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+import httpx
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+
 from jinja2 import Environment, FileSystemLoader, select_autoescape
-import resend
+
 from app.core.config import settings
+from app.utils.ttl_cache import TTLCache
 
 # set up Jinja2 to load from app/services/templates/
 TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), "templates")
 env = Environment(
     loader=FileSystemLoader(TEMPLATE_DIR),
     autoescape=select_autoescape(["html", "xml"]),
+    # Templates only change on deploy; skip the per-render mtime check outside DEBUG
+    auto_reload=settings.DEBUG,
+    cache_size=400,
 )
 
-# Initialize Resend with API key
-resend.api_key = settings.RESEND_API_KEY
+# Plain-text fallbacks, parsed once and filled with str.format_map per send
+_VERIFY_TEXT_FMT = """knoledg - Email Verification
+
+Your verification code is: {code}
+
+This code expires in 10 minutes. If you didn't request this verification, please ignore this email.
+
+Verify here: {verify_url}
+
+Need help? Contact us at {support_email}"""
+
+_RESET_TEXT_FMT = """knoledg - Password Reset
+
+Your password reset code is: {code}
+
+This code expires in 10 minutes. If you didn't request a password reset, please ignore this email and your password will remain unchanged.
+
+Need help? Contact us at {support_email}"""
+
+_WELCOME_TEXT_FMT = """Welcome to knoledg, {name}!
+
+Thank you for signing up. We're excited to help you with your studies.
+
+Get started by logging into your account and exploring our features.
+
+Need help? Contact us at {support_email}"""
+
+# Resolve templates once at import instead of on every send
+VERIFICATION_TPL = env.get_template("verification.html")
+RESET_TPL = env.get_template("reset_password.html")
+WELCOME_TPL = env.get_template("welcome.html")
+
+# Resend REST API, called through one pooled client so bursts of emails reuse the
+# same keep-alive TLS connection instead of handshaking per send.
+RESEND_API_URL = "https://api.resend.com"
+_RESEND_TIMEOUT_SECONDS = 10.0
+_RESEND_LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=10)
+_client: Optional[httpx.AsyncClient] = None
+
+# Most emails accepted by one /emails/batch request
+RESEND_BATCH_LIMIT = 50
+
+# Recent verification sends keyed by (email, code); each entry is the send task, so a
+# duplicate request awaits the in-flight send or reuses its result.
+VERIFICATION_DEDUP_TTL = 600  # seconds
+_VERIFICATION_SENDS: TTLCache["asyncio.Future[Dict[str, Any]]"] = TTLCache(
+    maxsize=10_000, ttl=VERIFICATION_DEDUP_TTL
+)
+
+
+def _get_client() -> httpx.AsyncClient:
+    """Return the shared Resend client, creating it on first use."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            base_url=RESEND_API_URL,
+            timeout=_RESEND_TIMEOUT_SECONDS,
+            limits=_RESEND_LIMITS,
+            headers={"Authorization": f"Bearer {settings.RESEND_API_KEY}"},
+        )
+    return _client
+
+
+async def aclose_client() -> None:
+    """Close the pooled Resend client (called on application shutdown)."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
 
 
 class EmailError(Exception):
@@ -32,7 +114,8 @@ def get_email_delivery_error_message(action: str) -> str:
     )
 
 
-async def send_email(
+def _build_params(
+    *,
     subject: str,
     recipient: Union[str, List[str]],
     body: Optional[str] = None,
@@ -45,31 +128,9 @@ async def send_email(
     headers: Optional[Dict[str, str]] = None,
     tags: Optional[Union[Dict[str, str], List[Dict[str, str]]]] = None,
 ) -> Dict[str, Any]:
-    """
-    Send an email via Resend API using the official SDK.
-    
-    Args:
-        subject: Email subject line
-        recipient: Single email or list of emails (max 50)
-        body: Plain text body (will be used as text_content if no text_content provided)
-        html_content: HTML version of the email
-        text_content: Plain text version of the email
-        sender: Sender email (defaults to settings.RESEND_FROM_EMAIL)
-        reply_to: Reply-to email address
-        cc: CC recipients
-        bcc: BCC recipients
-        headers: Custom headers dictionary
-        tags: Custom tags for tracking
-    
-    Returns:
-        Dict containing email ID and other response data
-        
-    Raises:
-        EmailError: If email sending fails
-    """
-    
+    """Build the Resend API payload for one email (shared by single and batch sends)."""
     # Prepare the email parameters
-    params: resend.Emails.SendParams = {
+    params: Dict[str, Any] = {
         "from": sender or settings.RESEND_FROM_EMAIL,
         "to": [recipient] if isinstance(recipient, str) else recipient,
         "subject": subject,
@@ -106,37 +167,146 @@ async def send_email(
             ]
         else:
             params["tags"] = tags
-    
+
+    return params
+
+
+async def _post(path: str, payload: Any, idempotency_key: Optional[str] = None) -> Any:
+    """POST a JSON payload to Resend, mapping transport/HTTP failures to EmailError."""
+    user_message = get_email_delivery_error_message("send emails")
+    # Resend answers a repeated Idempotency-Key with the original result instead of resending
+    request_headers = {"Idempotency-Key": idempotency_key} if idempotency_key else {}
     try:
-        # Send email using the official Resend SDK
-        response = resend.Emails.send(params)
-        
-        # The SDK returns the response directly, but let's ensure it's valid
-        if not response or not response.get("id"):
-            raise EmailError("Invalid response from Resend API - no email ID returned")
-            
-        return response
-        
-    except Exception as e:
-        user_message = get_email_delivery_error_message("send emails")
-        # Handle various types of errors
-        if hasattr(e, 'status_code'):
-            # HTTP error from Resend API
-            raise EmailError(
-                f"Resend API error ({e.status_code}): {str(e)}",
-                user_message=user_message,
+        if ORJSON_AVAILABLE:
+            # orjson encodes straight to bytes (rendered HTML bodies dominate the payload)
+            request_headers["Content-Type"] = "application/json"
+            response = await _get_client().post(
+                path, content=orjson.dumps(payload), headers=request_headers
             )
         else:
-            # Other errors (network, validation, etc.)
+            response = await _get_client().post(path, json=payload, headers=request_headers)
+    except httpx.HTTPError as e:
+        # Network / timeout errors
+        raise EmailError(
+            f"Failed to send email: {str(e)}",
+            user_message=user_message,
+        )
+
+    if response.status_code >= 400:
+        # HTTP error from Resend API
+        raise EmailError(
+            f"Resend API error ({response.status_code}): {response.text[:200]}",
+            user_message=user_message,
+        )
+
+    try:
+        return response.json()
+    except ValueError:
+        return None
+
+
+async def send_email(
+    subject: str,
+    recipient: Union[str, List[str]],
+    body: Optional[str] = None,
+    html_content: Optional[str] = None,
+    text_content: Optional[str] = None,
+    sender: Optional[str] = None,
+    reply_to: Optional[str] = None,
+    cc: Optional[Union[str, List[str]]] = None,
+    bcc: Optional[Union[str, List[str]]] = None,
+    headers: Optional[Dict[str, str]] = None,
+    tags: Optional[Union[Dict[str, str], List[Dict[str, str]]]] = None,
+    idempotency_key: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Send an email via the Resend REST API.
+    
+    Args:
+        subject: Email subject line
+        recipient: Single email or list of emails (max 50)
+        body: Plain text body (will be used as text_content if no text_content provided)
+        html_content: HTML version of the email
+        text_content: Plain text version of the email
+        sender: Sender email (defaults to settings.RESEND_FROM_EMAIL)
+        reply_to: Reply-to email address
+        cc: CC recipients
+        bcc: BCC recipients
+        headers: Custom headers dictionary
+        tags: Custom tags for tracking
+        idempotency_key: Optional key; Resend drops repeat sends with the same key (24h)
+    
+    Returns:
+        Dict containing email ID and other response data
+        
+    Raises:
+        EmailError: If email sending fails
+    """
+    
+    params = _build_params(
+        subject=subject,
+        recipient=recipient,
+        body=body,
+        html_content=html_content,
+        text_content=text_content,
+        sender=sender,
+        reply_to=reply_to,
+        cc=cc,
+        bcc=bcc,
+        headers=headers,
+        tags=tags,
+    )
+
+    data = await _post("/emails", params, idempotency_key=idempotency_key)
+    if not isinstance(data, dict) or not data.get("id"):
+        raise EmailError(
+            "Invalid response from Resend API - no email ID returned",
+            user_message=get_email_delivery_error_message("send emails"),
+        )
+
+    return data
+
+
+async def send_batch(
+    messages: Sequence[Dict[str, Any]],
+    idempotency_key: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Send many distinct emails through Resend's batch endpoint.
+
+    Args:
+        messages: ``send_email`` keyword arguments, one dict per email. They are packed
+            into ``/emails/batch`` calls of at most ``RESEND_BATCH_LIMIT`` emails each.
+        idempotency_key: Optional key for the whole batch; each request gets
+            ``<key>/<n>`` so a retried run is not delivered twice.
+
+    Returns:
+        One ``{"id": ...}`` entry per email, in input order
+
+    Raises:
+        EmailError: If any batch request fails
+    """
+    results: List[Dict[str, Any]] = []
+    for start in range(0, len(messages), RESEND_BATCH_LIMIT):
+        payload = [_build_params(**message) for message in messages[start:start + RESEND_BATCH_LIMIT]]
+        chunk_key = f"{idempotency_key}/{start // RESEND_BATCH_LIMIT}" if idempotency_key else None
+        data = await _post("/emails/batch", payload, idempotency_key=chunk_key)
+        entries = data.get("data") if isinstance(data, dict) else None
+        if not isinstance(entries, list):
             raise EmailError(
-                f"Failed to send email: {str(e)}",
-                user_message=user_message,
+                "Invalid response from Resend batch API - no email IDs returned",
+                user_message=get_email_delivery_error_message("send emails"),
             )
+        results.extend(entries)
+    return results
 
 
 async def send_verification_email(email: str, code: str, name:str) -> Dict[str, Any]:
     """
     Send a verification email with the provided code.
+
+    Duplicate calls for the same (email, code) within ``VERIFICATION_DEDUP_TTL`` seconds
+    (double-taps, client retries) share the first send instead of emailing again.
     
     Args:
         email: Recipient email address
@@ -145,6 +315,21 @@ async def send_verification_email(email: str, code: str, name:str) -> Dict[str,
     Returns:
         Dict containing email ID and response data
     """
+    dedup_key = f"verify:{email.strip().lower()}:{code}"
+    pending = _VERIFICATION_SENDS.get(dedup_key)
+    if pending is None:
+        pending = asyncio.ensure_future(_deliver_verification_email(email, code, name))
+        _VERIFICATION_SENDS.set(dedup_key, pending)
+    try:
+        return dict(await asyncio.shield(pending))
+    except Exception:
+        # Failed sends must stay retryable
+        if _VERIFICATION_SENDS.get(dedup_key) is pending:
+            _VERIFICATION_SENDS.pop(dedup_key)
+        raise
+
+
+async def _deliver_verification_email(email: str, code: str, name: str) -> Dict[str, Any]:
     try:
         from urllib.parse import urlencode
 
@@ -154,8 +339,7 @@ async def send_verification_email(email: str, code: str, name:str) -> Dict[str,
         verify_url = f"{frontend_base.rstrip('/')}/verify-email?{urlencode({'email': email})}"
 
         # Render HTML template
-        tpl = env.get_template("verification.html")
-        html = tpl.render(
+        html = VERIFICATION_TPL.render(
             code=code,
             name=name,
             verify_url=verify_url,
@@ -165,17 +349,11 @@ async def send_verification_email(email: str, code: str, name:str) -> Dict[str,
         )
         
         # Plain text fallback
-        text = f"""
-knoledg - Email Verification
-
-Your verification code is: {code}
-
-This code expires in 10 minutes. If you didn't request this verification, please ignore this email.
-
-Verify here: {verify_url}
-
-Need help? Contact us at {settings.SUPPORT_EMAIL}
-        """.strip()
+        text = _VERIFY_TEXT_FMT.format_map({
+            "code": code,
+            "verify_url": verify_url,
+            "support_email": settings.SUPPORT_EMAIL,
+        })
         
         return await send_email(
             subject="Verify your knoledg account",
@@ -206,8 +384,7 @@ async def send_reset_password_email(email: str, code: str, name: str) -> Dict[st
     """
     try:
         # Render HTML template
-        tpl = env.get_template("reset_password.html")
-        html = tpl.render(
+        html = RESET_TPL.render(
             code=code,
             name=name,
             app_name="knoledg",
@@ -216,15 +393,10 @@ async def send_reset_password_email(email: str, code: str, name: str) -> Dict[st
         )
         
         # Plain text fallback
-        text = f"""
-knoledg - Password Reset
-
-Your password reset code is: {code}
-
-This code expires in 10 minutes. If you didn't request a password reset, please ignore this email and your password will remain unchanged.
-
-Need help? Contact us at {settings.SUPPORT_EMAIL}
-        """.strip()
+        text = _RESET_TEXT_FMT.format_map({
+            "code": code,
+            "support_email": settings.SUPPORT_EMAIL,
+        })
         
         return await send_email(
             subject="Reset your knoledg password",
@@ -247,23 +419,17 @@ Need help? Contact us at {settings.SUPPORT_EMAIL}
 async def send_welcome_email(email: str, name: str) -> Dict[str, Any]:
     """Send a welcome email to new users"""
     try:
-        tpl = env.get_template("welcome.html")
-        html = tpl.render(
+        html = WELCOME_TPL.render(
             name=name,
             app_name="knoledg",
             support_email=settings.SUPPORT_EMAIL,
             logo_url=settings.LOGO
         )
         
-        text = f"""
-Welcome to knoledg, {name}!
-
-Thank you for signing up. We're excited to help you with your studies.
-
-Get started by logging into your account and exploring our features.
-
-Need help? Contact us at {settings.SUPPORT_EMAIL}
-        """.strip()
+        text = _WELCOME_TEXT_FMT.format_map({
+            "name": name,
+            "support_email": settings.SUPPORT_EMAIL,
+        })
         
         return await send_email(
             subject="Welcome to knoledg!",
@@ -3,13 +3,20 @@
 from __future__ import annotations
 
 import os
-from typing import Any, Dict, Optional
-
-from jinja2 import Environment, FileSystemLoader, select_autoescape
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+from jinja2 import (
+    Environment,
+    FileSystemBytecodeCache,
+    FileSystemLoader,
+    select_autoescape,
+)
 
 from app.core.config import settings
 from app.services.mail_handler_service import mailer_resend
 from app.services.mail_handler_service.mailer_resend import EmailError
+from app.utils.ttl_cache import TTLCache
 
 APP_NAME = "knoledg"
 TEMPLATE_DIR = os.path.join(
@@ -21,20 +28,73 @@ TEMPLATE_DIR = os.path.join(
 env = Environment(
     loader=FileSystemLoader(TEMPLATE_DIR),
     autoescape=select_autoescape(["html", "xml"]),
+    # Templates only change on deploy; skip the per-render mtime check outside DEBUG
+    auto_reload=settings.DEBUG,
+    cache_size=400,
+    # Compiled template code survives restarts, so cold workers skip the Jinja parse.
+    # Only an app-owned directory from settings is used (the deployment creates it);
+    # Jinja loads bytecode from it unchecked, so it must never be a shared temp path.
+    bytecode_cache=(
+        FileSystemBytecodeCache(settings.JINJA_BYTECODE_CACHE_DIR)
+        if settings.JINJA_BYTECODE_CACHE_DIR
+        else None
+    ),
 )
 
 
+# Compiled once at import; sends render these directly instead of calling get_template
+_TEMPLATES = {
+    name: env.get_template(name)
+    for name in (
+        "payment_success.html",
+        "payment_failure_retry.html",
+        "payment_retry_success.html",
+        "payment_downgrade.html",
+        "payment_cancellation.html",
+    )
+}
+
+
 def _render_template(template_name: str, context: Dict[str, Any]) -> str:
-    template = env.get_template(template_name)
-    return template.render(**context)
+    return _TEMPLATES[template_name].render(**context)
+
+
+# Resend responses by idempotency key, kept for Resend's 24h key window. A retried webhook
+# whose email already went out returns the original response without re-rendering.
+_SENT_EMAILS: TTLCache[Dict[str, Any]] = TTLCache(maxsize=2048, ttl=24 * 3600)
+
+
+# Email kinds: the Resend "type" tag and the idempotency-key prefix for each payment email
+_KIND_SUCCESS = "payment-success"
+_KIND_FAILED = "payment-failed"
+_KIND_RETRY_SUCCESS = "payment-retry-success"
+_KIND_DOWNGRADE = "payment-downgrade"
+_KIND_CANCELLATION = "payment-cancellation"
+
+
+def _tags(kind: str, provider: str) -> Dict[str, str]:
+    return {"type": kind, "provider": provider}
+
+
+def _idempotency_key(
+    kind: str, idempotency_key: Optional[str], invoice_id: Optional[str] = None
+) -> Optional[str]:
+    """Return the caller's key, else ``<kind>/<invoice_id>`` when the invoice is known."""
+    if idempotency_key:
+        return idempotency_key
+    return f"{kind}/{invoice_id}" if invoice_id else None
+
+
+# Settings-derived context shared by every payment email; copied per send
+_BASE = {
+    "app_name": APP_NAME,
+    "logo_url": settings.LOGO,
+    "support_email": settings.SUPPORT_EMAIL,
+}
 
 
 def _base_context(extra: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
-    base = {
-        "app_name": APP_NAME,
-        "logo_url": settings.LOGO,
-        "support_email": settings.SUPPORT_EMAIL,
-    }
+    base = _BASE.copy()
     if extra:
         base.update(extra)
     return base
@@ -44,66 +104,113 @@ def _build_subject(prefix: str, plan_name: str) -> str:
     return f"{prefix} · {plan_name}"
 
 
+# Plain-text bodies, one format string per shape (with / without the optional link),
+# filled with str.format_map per send
+_SUCCESS_FMT_NO_URL = (
+    "Hi {name},\n\n"
+    "We processed {amount} {currency} for your {plan_name} plan."
+    " Coverage now runs through {period_end}."
+    f"\n\n— {APP_NAME}"
+)
+_SUCCESS_FMT_WITH_URL = (
+    "Hi {name},\n\n"
+    "We processed {amount} {currency} for your {plan_name} plan."
+    " Coverage now runs through {period_end}."
+    " Manage billing: {manage_url}"
+    f"\n\n— {APP_NAME}"
+)
+_FAILURE_FMT_NO_URL = (
+    "Heads up {name} — attempt {attempt_number} of {max_attempts} failed for the"
+    " {plan_name} plan."
+    " Next retry: {next_retry_date}."
+    "\n\nWe'll keep trying, but the plan downgrades if we exhaust retries."
+)
+_FAILURE_FMT_WITH_URL = (
+    "Heads up {name} — attempt {attempt_number} of {max_attempts} failed for the"
+    " {plan_name} plan."
+    " Next retry: {next_retry_date}."
+    " Update billing here: {update_payment_url}"
+    "\n\nWe'll keep trying, but the plan downgrades if we exhaust retries."
+)
+_RETRY_SUCCESS_FMT_NO_URL = (
+    "Hi {name}, we successfully charged your account and extended access through {period_end}."
+)
+_RETRY_SUCCESS_FMT_WITH_URL = _RETRY_SUCCESS_FMT_NO_URL + " Billing portal: {manage_url}"
+_DOWNGRADE_FMT_NO_URL = (
+    "Your {plan_name} plan was downgraded on {downgrade_date} after retries failed."
+    " {plan_limit_summary}"
+)
+_DOWNGRADE_FMT_WITH_URL = _DOWNGRADE_FMT_NO_URL + " Reactivate: {reactivate_url}"
+_CANCELLATION_FMT_NO_URL = "Your {plan_name} plan will end on {effective_date}."
+_CANCELLATION_FMT_WITH_URL = _CANCELLATION_FMT_NO_URL + " Reactivate anytime: {reactivate_url}"
+
+
 def _success_text(context: Dict[str, Any]) -> str:
-    return (
-        f"Hi {context['name']},\n\n"
-        f"We processed {context['amount']} {context['currency']} for your {context['plan_name']} plan."
-        f" Coverage now runs through {context['period_end']}."
-        + (
-            f" Manage billing: {context['manage_url']}"
-            if context.get("manage_url")
-            else ""
-        )
-        + f"\n\n— {APP_NAME}"
-    )
+    fmt = _SUCCESS_FMT_WITH_URL if context.get("manage_url") else _SUCCESS_FMT_NO_URL
+    return fmt.format_map(context)
 
 
 def _failure_text(context: Dict[str, Any]) -> str:
-    return (
-        f"Heads up {context['name']} — attempt {context['attempt_number']} of {context['max_attempts']} failed for the"
-        f" {context['plan_name']} plan."
-        f" Next retry: {context['next_retry_date']}."
-        + (
-            f" Update billing here: {context['update_payment_url']}"
-            if context.get("update_payment_url")
-            else ""
-        )
-        + f"\n\nWe'll keep trying, but the plan downgrades if we exhaust retries."
-    )
+    fmt = _FAILURE_FMT_WITH_URL if context.get("update_payment_url") else _FAILURE_FMT_NO_URL
+    return fmt.format_map(context)
 
 
 def _retry_success_text(context: Dict[str, Any]) -> str:
-    return (
-        f"Hi {context['name']}, we successfully charged your account and extended access through {context['period_end']}."
-        + (
-            f" Billing portal: {context['manage_url']}"
-            if context.get("manage_url")
-            else ""
-        )
-    )
+    fmt = _RETRY_SUCCESS_FMT_WITH_URL if context.get("manage_url") else _RETRY_SUCCESS_FMT_NO_URL
+    return fmt.format_map(context)
 
 
 def _downgrade_text(context: Dict[str, Any]) -> str:
-    return (
-        f"Your {context['plan_name']} plan was downgraded on {context['downgrade_date']} after retries failed."
-        f" {context['plan_limit_summary']}"
-        + (
-            f" Reactivate: {context['reactivate_url']}"
-            if context.get("reactivate_url")
-            else ""
-        )
-    )
+    fmt = _DOWNGRADE_FMT_WITH_URL if context.get("reactivate_url") else _DOWNGRADE_FMT_NO_URL
+    return fmt.format_map(context)
 
 
 def _cancellation_text(context: Dict[str, Any]) -> str:
-    return (
-        f"Your {context['plan_name']} plan will end on {context['effective_date']}."
-        + (
-            f" Reactivate anytime: {context['reactivate_url']}"
-            if context.get("reactivate_url")
-            else ""
-        )
+    fmt = _CANCELLATION_FMT_WITH_URL if context.get("reactivate_url") else _CANCELLATION_FMT_NO_URL
+    return fmt.format_map(context)
+
+
+@dataclass(frozen=True)
+class _EmailSpec:
+    template: str
+    subject_prefix: str
+    render_text: Callable[[Dict[str, Any]], str]
+
+
+# What varies between payment emails, keyed by kind; _send_payment_email does the rest
+_SPECS: Dict[str, _EmailSpec] = {
+    _KIND_SUCCESS: _EmailSpec("payment_success.html", "Payment confirmed", _success_text),
+    _KIND_FAILED: _EmailSpec("payment_failure_retry.html", "Payment issue", _failure_text),
+    _KIND_RETRY_SUCCESS: _EmailSpec("payment_retry_success.html", "Billing restored", _retry_success_text),
+    _KIND_DOWNGRADE: _EmailSpec("payment_downgrade.html", "Plan downgraded", _downgrade_text),
+    _KIND_CANCELLATION: _EmailSpec("payment_cancellation.html", "Cancellation scheduled", _cancellation_text),
+}
+
+
+async def _send_payment_email(
+    kind: str,
+    *,
+    email: str,
+    provider: str,
+    idempotency_key: Optional[str],
+    context: Dict[str, Any],
+) -> Dict[str, Any]:
+    """Render the ``kind`` payment email from ``context`` and send it."""
+    if idempotency_key and (sent := _SENT_EMAILS.get(idempotency_key)) is not None:
+        return sent
+    spec = _SPECS[kind]
+    full_context = _base_context(context)
+    data = await mailer_resend.send_email(
+        subject=_build_subject(spec.subject_prefix, context["plan_name"]),
+        recipient=email,
+        html_content=_render_template(spec.template, full_context),
+        text_content=spec.render_text(full_context),
+        tags=_tags(kind, provider),
+        idempotency_key=idempotency_key,
     )
+    if idempotency_key:
+        _SENT_EMAILS.set(idempotency_key, data)
+    return data
 
 
 async def send_payment_success_email(
@@ -118,28 +225,24 @@ async def send_payment_success_email(
     period_end: str,
     manage_url: Optional[str] = None,
     provider: str = "unknown",
+    invoice_id: Optional[str] = None,
+    idempotency_key: Optional[str] = None,
 ) -> Dict[str, Any]:
-    context = _base_context(
-        {
+    return await _send_payment_email(
+        _KIND_SUCCESS,
+        email=email,
+        provider=provider,
+        idempotency_key=_idempotency_key(_KIND_SUCCESS, idempotency_key, invoice_id),
+        context={
             "name": name,
             "plan_name": plan_name,
             "billing_interval": billing_interval,
             "amount": amount,
-            "currency": currency,
+            "currency": currency.upper(),
             "period_start": period_start,
             "period_end": period_end,
             "manage_url": manage_url,
-        }
-    )
-    context["currency"] = currency.upper()
-    html = _render_template("payment_success.html", context)
-    text = _success_text(context)
-    return await mailer_resend.send_email(
-        subject=_build_subject("Payment confirmed", plan_name),
-        recipient=email,
-        html_content=html,
-        text_content=text,
-        tags={"type": "payment-success", "provider": provider},
+        },
     )
 
 
@@ -154,9 +257,16 @@ async def send_payment_failure_email(
     next_retry_date: str,
     update_payment_url: Optional[str] = None,
     provider: str = "unknown",
+    invoice_id: Optional[str] = None,
+    idempotency_key: Optional[str] = None,
 ) -> Dict[str, Any]:
-    context = _base_context(
-        {
+    attempt_id = f"{invoice_id}/{attempt_number}" if invoice_id else None
+    return await _send_payment_email(
+        _KIND_FAILED,
+        email=email,
+        provider=provider,
+        idempotency_key=_idempotency_key(_KIND_FAILED, idempotency_key, attempt_id),
+        context={
             "name": name,
             "plan_name": plan_name,
             "billing_interval": billing_interval,
@@ -164,16 +274,7 @@ async def send_payment_failure_email(
             "max_attempts": max_attempts,
             "next_retry_date": next_retry_date,
             "update_payment_url": update_payment_url,
-        }
-    )
-    html = _render_template("payment_failure_retry.html", context)
-    text = _failure_text(context)
-    return await mailer_resend.send_email(
-        subject=_build_subject("Payment issue", plan_name),
-        recipient=email,
-        html_content=html,
-        text_content=text,
-        tags={"type": "payment-failed", "provider": provider},
+        },
     )
 
 
@@ -185,23 +286,20 @@ async def send_retry_success_email(
     period_end: str,
     manage_url: Optional[str] = None,
     provider: str = "unknown",
+    invoice_id: Optional[str] = None,
+    idempotency_key: Optional[str] = None,
 ) -> Dict[str, Any]:
-    context = _base_context(
-        {
+    return await _send_payment_email(
+        _KIND_RETRY_SUCCESS,
+        email=email,
+        provider=provider,
+        idempotency_key=_idempotency_key(_KIND_RETRY_SUCCESS, idempotency_key, invoice_id),
+        context={
             "name": name,
             "plan_name": plan_name,
             "period_end": period_end,
             "manage_url": manage_url,
-        }
-    )
-    html = _render_template("payment_retry_success.html", context)
-    text = _retry_success_text(context)
-    return await mailer_resend.send_email(
-        subject=_build_subject("Billing restored", plan_name),
-        recipient=email,
-        html_content=html,
-        text_content=text,
-        tags={"type": "payment-retry-success", "provider": provider},
+        },
     )
 
 
@@ -214,24 +312,20 @@ async def send_downgrade_email(
     plan_limit_summary: str,
     reactivate_url: Optional[str] = None,
     provider: str = "unknown",
+    idempotency_key: Optional[str] = None,
 ) -> Dict[str, Any]:
-    context = _base_context(
-        {
+    return await _send_payment_email(
+        _KIND_DOWNGRADE,
+        email=email,
+        provider=provider,
+        idempotency_key=idempotency_key,
+        context={
             "name": name,
             "plan_name": plan_name,
             "downgrade_date": downgrade_date,
             "plan_limit_summary": plan_limit_summary,
             "reactivate_url": reactivate_url,
-        }
-    )
-    html = _render_template("payment_downgrade.html", context)
-    text = _downgrade_text(context)
-    return await mailer_resend.send_email(
-        subject=_build_subject("Plan downgraded", plan_name),
-        recipient=email,
-        html_content=html,
-        text_content=text,
-        tags={"type": "payment-downgrade", "provider": provider},
+        },
     )
 
 
@@ -243,23 +337,19 @@ async def send_cancellation_email(
     effective_date: str,
     reactivate_url: Optional[str] = None,
     provider: str = "unknown",
+    idempotency_key: Optional[str] = None,
 ) -> Dict[str, Any]:
-    context = _base_context(
-        {
+    return await _send_payment_email(
+        _KIND_CANCELLATION,
+        email=email,
+        provider=provider,
+        idempotency_key=idempotency_key,
+        context={
             "name": name,
             "plan_name": plan_name,
             "effective_date": effective_date,
             "reactivate_url": reactivate_url,
-        }
-    )
-    html = _render_template("payment_cancellation.html", context)
-    text = _cancellation_text(context)
-    return await mailer_resend.send_email(
-        subject=_build_subject("Cancellation scheduled", plan_name),
-        recipient=email,
-        html_content=html,
-        text_content=text,
-        tags={"type": "payment-cancellation", "provider": provider},
+        },
     )
 
 
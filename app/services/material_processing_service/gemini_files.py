@@ -1,22 +1,22 @@
 """Gemini Files API integration for study material assets (PDFs, images)."""
 
+import asyncio
+import io
 import logging
 import os
+import re
 from dataclasses import dataclass
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 from typing import Optional
 
 import google.generativeai as genai
 from google.api_core import exceptions as google_exceptions
 
-from app.core.config import settings
 from app.core.genai_client import get_gemini_model
 
 logger = logging.getLogger(__name__)
 
-# Configure Gemini API
-genai.configure(api_key=settings.GOOGLE_API_KEY)
-
 SUPPORTED_FILE_MIME_TYPES = {
     ".pdf": "application/pdf",
     ".png": "image/png",
@@ -30,6 +30,12 @@ SUPPORTED_FILE_MIME_TYPES = {
 
 GEMINI_FILE_TTL = timedelta(hours=48)
 
+# Stored form written by encode_gemini_file_metadata: uri|expires[|mime]
+_MAX_METADATA_LEN = 512
+_METADATA_RE = re.compile(
+    r"gemini_file_uri:(?P<uri>[^|]+)\|expires:(?P<expires>[^|]+)(?:\|mime:(?P<mime>[^|]+))?"
+)
+
 
 @dataclass(frozen=True)
 class GeminiFileMetadata:
@@ -38,12 +44,15 @@ class GeminiFileMetadata:
     mime_type: Optional[str] = None
 
 
+# Both lookups are pure and a process sees few distinct filenames, so results are memoized
+@lru_cache(maxsize=1024)
 def is_supported_file_type(filename: str) -> bool:
     """Return True if the filename has an extension supported by Gemini Files."""
     ext = os.path.splitext(filename or "")[1].lower()
     return ext in SUPPORTED_FILE_MIME_TYPES
 
 
+@lru_cache(maxsize=1024)
 def _mime_type_for_filename(filename: str) -> str:
     ext = os.path.splitext(filename or "")[1].lower()
     if ext not in SUPPORTED_FILE_MIME_TYPES:
@@ -79,28 +88,19 @@ async def upload_file_to_gemini(
     try:
         logger.info("Uploading asset to Gemini Files API: %s (%s)", filename, mime_type)
 
-        # The SDK expects a file path or file-like object. Persist bytes to a temp file.
-        import tempfile
-
-        suffix = os.path.splitext(filename or "")[1] or ".bin"
-        with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as tmp:
-            tmp.write(file_bytes)
-            tmp_path = tmp.name
-
-        try:
-            uploaded_file = genai.upload_file(
-                path=tmp_path,
-                mime_type=mime_type,
-                display_name=display_name or filename,
-            )
-        finally:
-            try:
-                os.unlink(tmp_path)
-            except OSError:
-                pass
+        # The SDK accepts a file-like object (mime_type is then required), so the
+        # bytes are handed over in memory rather than round-tripped through a temp file
+        buffer = io.BytesIO(file_bytes)
+        # upload_file is a blocking HTTP call; run it off the event loop
+        uploaded_file = await asyncio.to_thread(
+            genai.upload_file,
+            path=buffer,
+            mime_type=mime_type,
+            display_name=display_name or filename,
+        )
 
         # Calculate expiration (48 hours from now)
-        expiration_time = datetime.utcnow() + GEMINI_FILE_TTL
+        expiration_time = datetime.now(timezone.utc) + GEMINI_FILE_TTL
 
         logger.info("Asset uploaded successfully: %s", uploaded_file.uri)
         logger.info("File expires at: %s", expiration_time)
@@ -122,6 +122,8 @@ async def generate_from_gemini_file(
     prompt: str,
     mime_type: str,
     generation_config: Optional[dict] = None,
+    trailing_prompt: Optional[str] = None,
+    system_instruction: Optional[str] = None,
 ) -> str:
     """
     Generate content using a Gemini file URI.
@@ -131,6 +133,10 @@ async def generate_from_gemini_file(
         prompt: Generation prompt
         mime_type: MIME type associated with the uploaded Gemini file
         generation_config: Optional Gemini generation config overrides
+        trailing_prompt: Optional text placed after the file part. Keeping the
+            per-request text here leaves ``prompt`` + file as a stable prefix
+            that Gemini's implicit context caching can reuse across calls.
+        system_instruction: Optional static instruction bound to the model client
 
     Returns:
         Generated text content
@@ -141,27 +147,28 @@ async def generate_from_gemini_file(
     try:
         logger.info("Generating content from Gemini file: %s", file_uri)
 
-        model = get_gemini_model()
+        model = get_gemini_model(system_instruction=system_instruction)
 
-        parts = [
-            {
-                "role": "user",
-                "parts": [
-                    {"text": prompt},
-                    {"file_data": {"file_uri": file_uri, "mime_type": mime_type}},
-                ],
-            }
+        content_parts = [
+            {"text": prompt},
+            {"file_data": {"file_uri": file_uri, "mime_type": mime_type}},
         ]
+        if trailing_prompt:
+            content_parts.append({"text": trailing_prompt})
+
+        parts = [{"role": "user", "parts": content_parts}]
 
         response = await model.generate_content_async(
             parts,
             generation_config=generation_config,
         )
 
-        if not response or not getattr(response, "text", ""):
+        # Read .text once: each access re-joins the candidate parts
+        raw_text = getattr(response, "text", "") if response else ""
+        if not raw_text or raw_text.isspace():
             raise ValueError("Empty response from Gemini")
 
-        text = response.text.strip()
+        text = raw_text.strip()
         logger.info("Generated %s characters", len(text))
         return text
 
@@ -174,12 +181,20 @@ async def get_or_refresh_gemini_file(
     material_content: str,
     file_bytes: bytes,
     filename: str,
+    now: Optional[datetime] = None,
+    stored: Optional[GeminiFileMetadata] = None,
 ) -> GeminiFileMetadata:
-    """Return a valid Gemini Files reference, uploading a fresh copy when needed."""
+    """Return a valid Gemini Files reference, uploading a fresh copy when needed.
+
+    ``now`` (timezone-aware UTC) lets callers checking many materials share one clock read.
+    ``stored`` is the reference read from the material's Gemini columns; when given,
+    ``material_content`` is not parsed.
+    """
 
     expected_mime = _mime_type_for_filename(filename)
-    metadata = decode_gemini_file_metadata(material_content)
-    now = datetime.utcnow()
+    metadata = stored if stored is not None else decode_gemini_file_metadata(material_content)
+    if now is None:
+        now = datetime.now(timezone.utc)
 
     if metadata:
         current_mime = metadata.mime_type or expected_mime
@@ -192,7 +207,7 @@ async def get_or_refresh_gemini_file(
                 )
             else:
                 try:
-                    genai.get_file(name=file_name)
+                    await asyncio.to_thread(genai.get_file, name=file_name)
                 except google_exceptions.GoogleAPIError as exc:
                     logger.warning(
                         "Stored Gemini file %s is not accessible (reason: %s); re-uploading",
@@ -248,25 +263,20 @@ def encode_gemini_file_metadata(
 def decode_gemini_file_metadata(content: str) -> Optional[GeminiFileMetadata]:
     """Decode stored Gemini file metadata (handles legacy formats gracefully)."""
 
-    if not content or not content.startswith("gemini_file_uri:"):
+    # Encoded references are short; long content is extracted text and is rejected unscanned
+    if not content or len(content) > _MAX_METADATA_LEN:
+        return None
+
+    match = _METADATA_RE.match(content)
+    if not match:
         return None
 
     try:
-        entries = {}
-        for section in content.split("|"):
-            if ":" not in section:
-                continue
-            key, value = section.split(":", 1)
-            entries[key] = value
-
-        uri = entries.get("gemini_file_uri")
-        expires_raw = entries.get("expires")
-        if not uri or not expires_raw:
-            return None
-
-        expires_at = datetime.fromisoformat(expires_raw)
-        mime_type = entries.get("mime")
-
-        return GeminiFileMetadata(uri=uri, expires_at=expires_at, mime_type=mime_type)
-    except Exception:
+        expires_at = datetime.fromisoformat(match["expires"])
+    except ValueError:
         return None
+    if expires_at.tzinfo is None:
+        # Rows written before expiries were timezone-aware hold naive UTC timestamps
+        expires_at = expires_at.replace(tzinfo=timezone.utc)
+
+    return GeminiFileMetadata(uri=match["uri"], expires_at=expires_at, mime_type=match["mime"])
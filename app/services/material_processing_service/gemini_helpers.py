@@ -3,21 +3,72 @@ Helper utilities for using Gemini Files API across AI features.
 Provides DRY, scalable functions to handle file URI retrieval and refresh.
 """
 import logging
-from typing import Optional
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
 
+from sqlalchemy import or_, update
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
 
 from app.models.study_material import StudyMaterial
 from app.services.storage_service import get_storage_backend
 from app.services.material_processing_service.gemini_files import (
+    GEMINI_FILE_TTL,
     GeminiFileMetadata,
+    decode_gemini_file_metadata,
     encode_gemini_file_metadata,
     get_or_refresh_gemini_file,
     is_supported_file_type,
 )
+from app.utils.ttl_cache import TTLCache
 
 logger = logging.getLogger(__name__)
 
+# Known-good Gemini references by material id. A warm hit skips the storage download,
+# metadata decode and Files API check; entries are only served while the URI has at
+# least _EXPIRY_MARGIN left, so a reference never expires mid-request.
+_REFERENCE_CACHE: TTLCache[GeminiFileMetadata] = TTLCache(
+    maxsize=10_000,
+    ttl=GEMINI_FILE_TTL.total_seconds(),
+)
+_EXPIRY_MARGIN = timedelta(minutes=10)
+
+
+def _column_metadata(material: StudyMaterial) -> Optional[GeminiFileMetadata]:
+    """Return the reference held in the material's Gemini columns, if populated."""
+    if not material.gemini_file_uri or material.gemini_file_expires_at is None:
+        return None
+    return GeminiFileMetadata(
+        uri=material.gemini_file_uri,
+        expires_at=material.gemini_file_expires_at,
+        mime_type=material.gemini_file_mime_type,
+    )
+
+
+def stored_gemini_file_metadata(material: StudyMaterial) -> Optional[GeminiFileMetadata]:
+    """Return the material's stored Gemini reference, preferring the structured columns.
+
+    Rows written before the columns existed fall back to the pipe-encoded ``content``.
+    """
+    return _column_metadata(material) or decode_gemini_file_metadata(material.content or "")
+
+
+def gemini_file_column_values(metadata: GeminiFileMetadata) -> Dict[str, Any]:
+    """Return ``StudyMaterial`` column values that persist ``metadata``.
+
+    ``content`` keeps the legacy encoding too, so older readers still find the reference.
+    """
+    return {
+        "gemini_file_uri": metadata.uri,
+        "gemini_file_expires_at": metadata.expires_at,
+        "gemini_file_mime_type": metadata.mime_type,
+        "content": encode_gemini_file_metadata(
+            metadata.uri,
+            metadata.expires_at,
+            metadata.mime_type,
+        ),
+    }
+
 
 async def get_gemini_file_reference_for_material(
     material: StudyMaterial,
@@ -34,33 +85,54 @@ async def get_gemini_file_reference_for_material(
         )
         return None
 
+    now = datetime.now(timezone.utc)
+    cached = _REFERENCE_CACHE.get(material.id)
+    if cached is not None:
+        if cached.expires_at > now + _EXPIRY_MARGIN:
+            return cached
+        _REFERENCE_CACHE.pop(material.id)
+
     backend = get_storage_backend()
 
     try:
         file_bytes = await backend.get_bytes(key=material.file_path)
 
+        stored = _column_metadata(material)
         metadata = await get_or_refresh_gemini_file(
             material.content or "",
             file_bytes,
             filename,
+            now=now,
+            stored=stored,
         )
 
-        encoded = encode_gemini_file_metadata(
-            metadata.uri,
-            metadata.expires_at,
-            metadata.mime_type,
-        )
-
-        if encoded != (material.content or ""):
-            material.content = encoded
-            session.add(material)
+        if metadata != stored:
+            values = gemini_file_column_values(metadata)
+            # Conditional UPDATE: a no-op when a concurrent request already stored the
+            # same reference, and no ORM flush of the whole row
+            await session.execute(
+                update(StudyMaterial)
+                .where(
+                    StudyMaterial.id == material.id,
+                    or_(
+                        StudyMaterial.gemini_file_uri.is_distinct_from(metadata.uri),
+                        StudyMaterial.content.is_distinct_from(values["content"]),
+                    ),
+                )
+                .values(**values)
+                .execution_options(synchronize_session=False)
+            )
             await session.commit()
+            # Mirror the row onto the loaded instance without marking it dirty
+            for column, value in values.items():
+                set_committed_value(material, column, value)
             logger.info(
                 "Stored Gemini file metadata for material %s (expires %s)",
                 material.id,
                 metadata.expires_at,
             )
 
+        _REFERENCE_CACHE.set(material.id, metadata)
         return metadata
     except Exception as exc:
         logger.error(
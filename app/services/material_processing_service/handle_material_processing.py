@@ -1,12 +1,21 @@
 # app/services/material_processing_service/handle_material_processing.py
 
+import asyncio
+import hashlib
 import io
 import logging
 import os
-import tempfile
-from typing import Tuple, Optional
+import re
+from typing import Dict, Optional, Tuple
 from pypdf import PdfReader
 
+try:
+    import fitz  # PyMuPDF
+    FITZ_AVAILABLE = True
+except ImportError:
+    fitz = None
+    FITZ_AVAILABLE = False
+
 from app.core.genai_client import (
     DEFAULT_MULTIMODAL_GENERATION_CONFIG,
     FALLBACK_TEXT_GENERATION_CONFIG,
@@ -27,10 +36,28 @@ from app.services.document_conversion.gotenberg_client import (
     GotenbergConversionError,
     GotenbergNotConfigured,
 )
-from app.services.material_processing_service.gemini_files import SUPPORTED_FILE_MIME_TYPES
+from app.services.material_processing_service.gemini_files import (
+    SUPPORTED_FILE_MIME_TYPES,
+    GeminiFileMetadata,
+    generate_from_gemini_file,
+)
+from app.utils.token_budget import truncate_to_token_budget
+from app.utils.ttl_cache import TTLCache
 
 logger = logging.getLogger(__name__)
 
+# Images above this size are referenced through their Files API upload rather than sent
+# inline (inline parts are base64-encoded, ~33% larger); small ones go inline so the
+# overview need not wait for the upload.
+INLINE_IMAGE_MAX_BYTES = 1024 * 1024
+
+# Finished overviews by (file content, title): re-processing identical bytes skips Gemini
+_OVERVIEW_CACHE: TTLCache[str] = TTLCache(maxsize=256, ttl=24 * 3600)
+
+# Token budget for extracted text sent on the text-only fallback path (~80k characters);
+# a short overview gains nothing from the tail of very long materials.
+MAX_CONTEXT_TOKENS = 20_000
+
 
 def _normalize_markdown(raw_text: str) -> str:
     """Return sanitized markdown string for overview outputs."""
@@ -42,26 +69,197 @@ def _normalize_markdown(raw_text: str) -> str:
     return markdown_content
 
 
+# Overview prompts are static apart from the title / page count; built once, filled per call
+_OVERVIEW_PROMPT_TEMPLATE = (
+    "{page_fragment}You will generate a VERY SHORT overview for the provided document.\n"
+    "\n"
+    "STRICT OUTPUT RULES (MANDATORY):\n"
+    "- First line must be an H1 with the exact title provided: '# {title}'. Do not alter it.\n"
+    "- Follow with ONE short paragraph (60–120 words) summarizing purpose, scope, key concepts, and main results.\n"
+    "- If mathematical content appears, include key formula(s) in proper LaTeX using $$...$$.\n"
+    "- No other headings, lists, tables, images, or code blocks. Paragraph only.\n"
+    "- Do NOT include page counts, citations, or links.\n"
+    "\n"
+    "Return ONLY the markdown described above."
+)
+_IMAGE_OVERVIEW_PROMPT_TEMPLATE = (
+    "You will generate a VERY SHORT overview for the provided image content.\n"
+    "\n"
+    "STRICT OUTPUT RULES (MANDATORY):\n"
+    "- First line must be an H1 with the exact title provided: '# {title}'. Do not alter it.\n"
+    "- Follow with ONE short paragraph (60–120 words) summarizing purpose, scope, and key ideas.\n"
+    "- If mathematical content is present, include key formula(s) in proper LaTeX using $$...$$.\n"
+    "- No other headings, lists, tables, images, or code blocks. Paragraph only.\n"
+    "- Do NOT include page counts, citations, or links.\n"
+    "\n"
+    "Return ONLY the markdown described above."
+)
+
+
 def _build_overview_prompt(title: Optional[str], page_count: Optional[int]) -> str:
-    exact_title = (title or "Overview").strip()
     page_fragment = f"Source material: ~{page_count} pages.\n" if page_count else ""
-    return (
-        f"{page_fragment}You will generate a VERY SHORT overview for the provided document.\n"
-        "\n"
-        "STRICT OUTPUT RULES (MANDATORY):\n"
-        f"- First line must be an H1 with the exact title provided: '# {exact_title}'. Do not alter it.\n"
-        "- Follow with ONE short paragraph (60–120 words) summarizing purpose, scope, key concepts, and main results.\n"
-        "- If mathematical content appears, include key formula(s) in proper LaTeX using $$...$$.\n"
-        "- No other headings, lists, tables, images, or code blocks. Paragraph only.\n"
-        "- Do NOT include page counts, citations, or links.\n"
-        "\n"
-        "Return ONLY the markdown described above."
+    return _OVERVIEW_PROMPT_TEMPLATE.format(
+        page_fragment=page_fragment,
+        title=(title or "Overview").strip(),
     )
 
 
+def _fit_fallback_text(text: str) -> str:
+    """Trim extracted text to the fallback token budget, logging how much was kept."""
+    trimmed = truncate_to_token_budget(text, MAX_CONTEXT_TOKENS)
+    if len(trimmed) < len(text):
+        logger.info(
+            "Truncated fallback context to %d/%d characters (%.0f%%)",
+            len(trimmed),
+            len(text),
+            100 * len(trimmed) / len(text),
+        )
+    return trimmed
+
+
+def _overview_cache_key(digest: str, title: Optional[str]) -> str:
+    return f"{digest}:{(title or 'Overview').strip()}"
+
+
+def _read_file_with_digest(path: str) -> Tuple[bytes, str]:
+    """Read a file and return its bytes with their SHA-256 hex digest.
+
+    One read serves both the upload and the cache key; hashing the in-memory
+    bytes (hashlib releases the GIL) avoids a second pass over the file.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    return data, hashlib.sha256(data).hexdigest()
+
+
+def _pdf_digest_and_page_count(pdf_bytes: bytes) -> Tuple[str, int]:
+    return hashlib.sha256(pdf_bytes).hexdigest(), get_pdf_page_count_from_bytes(pdf_bytes)
+
+
+def _read_pdf_with_digest(path: str) -> Tuple[bytes, str, int]:
+    """Read a PDF and return its bytes, SHA-256 hex digest and page count.
+
+    Runs as one worker-thread call so neither the read nor the parse blocks the loop.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    return (data, *_pdf_digest_and_page_count(data))
+
+
+def _read_office_doc(path: str, ext: str) -> Tuple[bytes, int]:
+    with open(path, "rb") as f:
+        data = f.read()
+    return data, get_office_page_count(data, ext)
+
+
+_STARTXREF_RE = re.compile(rb"startxref\s+(\d+)")
+_XREF_SECTION_RE = re.compile(rb"\s*(\d+)[ \t]+(\d+)[ \t]*(?:\r\n|\r|\n)")
+_XREF_ENTRY_RE = re.compile(rb"(\d{10}) (\d{5}) ([nf])")
+_TRAILER_ROOT_RE = re.compile(rb"/Root\s+(\d+)\s+\d+\s+R")
+_TRAILER_PREV_RE = re.compile(rb"/Prev\s+(\d+)")
+_CATALOG_PAGES_RE = re.compile(rb"/Pages\s+(\d+)\s+\d+\s+R")
+# \b stops the digits backtracking so an indirect "/Count 15 0 R" fails to match
+_PAGE_COUNT_RE = re.compile(rb"/Count\s+(\d+)\b(?!\s+\d+\s+R)")
+
+
+def _read_xref_tables(pdf_bytes: bytes) -> Optional[Tuple[Dict[int, int], int]]:
+    """Return ``(object offsets, root object number)`` from the classic xref tables.
+
+    Follows ``/Prev`` from the newest revision back, so incremental updates resolve to
+    the latest copy of each object. Returns None for cross-reference streams (PDF 1.5
+    object streams) or anything malformed.
+    """
+    tail = pdf_bytes[-1024:]
+    starts = _STARTXREF_RE.findall(tail)
+    if not starts:
+        return None
+
+    offsets: Dict[int, int] = {}
+    root: Optional[int] = None
+    xref_pos: Optional[int] = int(starts[-1])
+    seen = set()
+    while xref_pos is not None:
+        if xref_pos in seen or not pdf_bytes.startswith(b"xref", xref_pos):
+            return None
+        seen.add(xref_pos)
+        pos = xref_pos + 4
+        while True:
+            section = _XREF_SECTION_RE.match(pdf_bytes, pos)
+            if not section:
+                break
+            first, count = int(section.group(1)), int(section.group(2))
+            pos = section.end()
+            for index in range(count):
+                entry = _XREF_ENTRY_RE.match(pdf_bytes, pos + 20 * index)
+                if not entry:
+                    return None
+                # Newer revisions are read first and win
+                if entry.group(3) == b"n":
+                    offsets.setdefault(first + index, int(entry.group(1)))
+            pos += 20 * count
+
+        trailer_pos = pdf_bytes.find(b"trailer", pos, pos + 64)
+        if trailer_pos == -1:
+            return None
+        trailer_end = pdf_bytes.find(b"startxref", trailer_pos)
+        trailer = pdf_bytes[trailer_pos:trailer_end if trailer_end != -1 else None]
+        if root is None:
+            root_match = _TRAILER_ROOT_RE.search(trailer)
+            root = int(root_match.group(1)) if root_match else None
+        prev = _TRAILER_PREV_RE.search(trailer)
+        xref_pos = int(prev.group(1)) if prev else None
+
+    if root is None:
+        return None
+    return offsets, root
+
+
+def _object_body(pdf_bytes: bytes, offsets: Dict[int, int], number: int) -> Optional[bytes]:
+    offset = offsets.get(number)
+    if offset is None:
+        return None
+    header = re.match(rb"\s*(\d+)\s+\d+\s+obj", pdf_bytes[offset:offset + 32])
+    if not header or int(header.group(1)) != number:
+        return None
+    end = pdf_bytes.find(b"endobj", offset)
+    return pdf_bytes[offset:end] if end != -1 else None
+
+
+def _scan_pdf_page_count(pdf_bytes: bytes) -> Optional[int]:
+    """Read the page count from the page tree root without a full PDF parse.
+
+    Resolves trailer ``/Root`` -> catalog ``/Pages`` -> ``/Count`` through the xref
+    table, so only the file tail and two objects are touched, and page trees of
+    embedded files are never consulted. Returns None when the file doesn't use
+    classic xref tables so the caller parses it instead.
+    """
+    xref = _read_xref_tables(pdf_bytes)
+    if xref is None:
+        return None
+    offsets, root = xref
+
+    catalog = _object_body(pdf_bytes, offsets, root)
+    pages_ref = _CATALOG_PAGES_RE.search(catalog) if catalog else None
+    if not pages_ref:
+        return None
+    pages = _object_body(pdf_bytes, offsets, int(pages_ref.group(1)))
+    count = _PAGE_COUNT_RE.search(pages) if pages else None
+    if not count:
+        return None
+    return int(count.group(1)) or None
+
+
 def get_pdf_page_count_from_bytes(pdf_bytes: bytes) -> int:
     """Return number of pages from PDF bytes."""
     try:
+        if FITZ_AVAILABLE:
+            # MuPDF reads the page count from the page tree without building pypdf's object graph
+            with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+                return doc.page_count
+        # Without MuPDF, try the xref lookup before pypdf builds its whole page list
+        scanned = _scan_pdf_page_count(pdf_bytes)
+        if scanned is not None:
+            return scanned
         reader = PdfReader(io.BytesIO(pdf_bytes))
         return len(reader.pages)
     except Exception:
@@ -90,92 +288,109 @@ def _extract_text_from_pdf_bytes(pdf_bytes: bytes) -> str:
         return ""
 
 # Function to handle non-PDF image files
-async def process_image_via_gemini(image_path: str, mode: str = "overview", title: Optional[str] = None) -> Tuple[str, str]:
-    """Generate overview markdown for image-based materials."""
+async def process_image_via_gemini(
+    image_path: str,
+    mode: str = "overview",
+    title: Optional[str] = None,
+    gemini_file: Optional[GeminiFileMetadata] = None,
+) -> Tuple[str, str]:
+    """Generate overview markdown for image-based materials.
+
+    When ``gemini_file`` (a Files API copy of the image) is given it is referenced by
+    URI instead of inlining the bytes as base64.
+    """
     try:
         if (mode or "overview").lower() != "overview":
             raise ValueError("Detailed notes are generated via notes_service. Use overview mode here.")
 
-        # Read image file
-        with open(image_path, "rb") as f:
-            image_bytes = f.read()
+        # Read + hash the image off the event loop
+        image_bytes, digest = await asyncio.to_thread(_read_file_with_digest, image_path)
+
+        cache_key = _overview_cache_key(digest, title)
+        cached = _OVERVIEW_CACHE.get(cache_key)
+        if cached is not None:
+            return "", cached
 
         ext = os.path.splitext(image_path or "")[1].lower()
         mime_type = SUPPORTED_FILE_MIME_TYPES.get(ext, "image/jpeg")
 
         # Generate markdown directly from image (single step)
         model = get_gemini_model()
-        exact_title = (title or "Overview").strip()
-        markdown_prompt = (
-            "You will generate a VERY SHORT overview for the provided image content.\n"
-            "\n"
-            "STRICT OUTPUT RULES (MANDATORY):\n"
-            f"- First line must be an H1 with the exact title provided: '# {exact_title}'. Do not alter it.\n"
-            "- Follow with ONE short paragraph (60–120 words) summarizing purpose, scope, and key ideas.\n"
-            "- If mathematical content is present, include key formula(s) in proper LaTeX using $$...$$.\n"
-            "- No other headings, lists, tables, images, or code blocks. Paragraph only.\n"
-            "- Do NOT include page counts, citations, or links.\n"
-            "\n"
-            "Return ONLY the markdown described above."
-        )
-        markdown_response = await model.generate_content_async(
-            [
-                markdown_prompt,
-                {"mime_type": mime_type, "data": image_bytes},
-            ],
-            generation_config=DEFAULT_MULTIMODAL_GENERATION_CONFIG.copy(),
+        markdown_prompt = _IMAGE_OVERVIEW_PROMPT_TEMPLATE.format(
+            title=(title or "Overview").strip()
         )
+        if gemini_file:
+            response_text = await generate_from_gemini_file(
+                file_uri=gemini_file.uri,
+                prompt=markdown_prompt,
+                mime_type=gemini_file.mime_type or mime_type,
+                generation_config=DEFAULT_MULTIMODAL_GENERATION_CONFIG.copy(),
+            )
+        else:
+            markdown_response = await model.generate_content_async(
+                [
+                    markdown_prompt,
+                    {"mime_type": mime_type, "data": image_bytes},
+                ],
+                generation_config=DEFAULT_MULTIMODAL_GENERATION_CONFIG.copy(),
+            )
+            response_text = markdown_response.text
 
-        markdown_content = _normalize_markdown(markdown_response.text)
+        markdown_content = _normalize_markdown(response_text)
         # Use logger instead of print to avoid Windows pipe issues in background tasks
         logger.info(
-            f"Generated markdown length: {len(markdown_content)} characters"
+            "Generated markdown length: %d characters", len(markdown_content)
         )
 
+        _OVERVIEW_CACHE.set(cache_key, markdown_content)
         # Return empty string for raw_text since we're doing direct processing
         return "", markdown_content
 
     except Exception as e:
-        logger.exception(f"Failed to process image via Gemini: {str(e)}")
+        logger.exception("Failed to process image via Gemini: %s", e)
         # Return empty results in case of failure
         return "", f"# Processing Failed\n\nError: {str(e)}"
 
 
-# Function to handle PDF files
-async def process_pdf_via_gemini(pdf_path: str, mode: str = "overview", title: Optional[str] = None) -> Tuple[str, str, int]:
-    """
-    Process a PDF file directly to markdown through Gemini API.
-
-    Args:
-        pdf_path: Path to the PDF file
-        mode: "overview" for concise overview, "detailed" for full study guide
+async def _overview_from_pdf_bytes(
+    pdf_bytes: bytes,
+    digest: str,
+    page_count: int,
+    mode: str = "overview",
+    title: Optional[str] = None,
+    gemini_file: Optional[GeminiFileMetadata] = None,
+) -> Tuple[str, str, int]:
+    """Generate the overview for PDF bytes already read, hashed and page-counted.
 
-    Returns:
-        raw_text: Empty string (no longer extracted separately)
-        markdown_content: Direct markdown analysis of the PDF content
-        page_count: Number of pages in the PDF
+    Raises on failure; callers turn errors into their failure markdown.
     """
-    try:
-        # Read PDF file as bytes
-        with open(pdf_path, "rb") as f:
-            pdf_bytes = f.read()
-
-        # Get page count from bytes (more efficient - single read)
-        page_count = get_pdf_page_count_from_bytes(pdf_bytes)
+    # Use logger instead of print to avoid Windows pipe issues in background tasks
+    logger.info(
+        "Processing PDF with %d pages directly to markdown via Gemini...", page_count
+    )
 
-        # Use logger instead of print to avoid Windows pipe issues in background tasks
-        logger.info(
-            f"Processing PDF with {page_count} pages directly to markdown via Gemini..."
-        )
+    # Generate markdown directly from PDF (single step)
+    if (mode or "overview").lower() != "overview":
+        raise ValueError("Detailed notes are generated via notes_service. Use overview mode here.")
 
-        # Generate markdown directly from PDF (single step)
-        if (mode or "overview").lower() != "overview":
-            raise ValueError("Detailed notes are generated via notes_service. Use overview mode here.")
+    cache_key = _overview_cache_key(digest, title)
+    cached = _OVERVIEW_CACHE.get(cache_key)
+    if cached is not None:
+        return "", cached, page_count
 
-        model = get_gemini_model()
-        markdown_prompt = _build_overview_prompt(title, page_count)
-        mime_type = SUPPORTED_FILE_MIME_TYPES.get(".pdf", "application/pdf")
-        try:
+    model = get_gemini_model()
+    markdown_prompt = _build_overview_prompt(title, page_count)
+    mime_type = SUPPORTED_FILE_MIME_TYPES.get(".pdf", "application/pdf")
+    try:
+        if gemini_file:
+            # Reference the already-uploaded copy: no second multi-MB inline payload
+            response_text = await generate_from_gemini_file(
+                file_uri=gemini_file.uri,
+                prompt=markdown_prompt,
+                mime_type=gemini_file.mime_type or mime_type,
+                generation_config=DEFAULT_MULTIMODAL_GENERATION_CONFIG.copy(),
+            )
+        else:
             markdown_response = await model.generate_content_async(
                 [
                     markdown_prompt,
@@ -183,46 +398,82 @@ async def process_pdf_via_gemini(pdf_path: str, mode: str = "overview", title: O
                 ],
                 generation_config=DEFAULT_MULTIMODAL_GENERATION_CONFIG.copy(),
             )
+            response_text = markdown_response.text
 
-            markdown_content = _normalize_markdown(markdown_response.text)
-            # Use logger instead of print to avoid Windows pipe issues in background tasks
-            logger.info(
-                f"Generated markdown length: {len(markdown_content)} characters"
-            )
+        markdown_content = _normalize_markdown(response_text)
+        # Use logger instead of print to avoid Windows pipe issues in background tasks
+        logger.info(
+            "Generated markdown length: %d characters", len(markdown_content)
+        )
 
-            # Return empty string for raw_text since we're doing direct processing
-            return "", markdown_content, page_count
-        except Exception as primary_error:
-            # Windows pipe or multimodal upload path failed: fallback to text-only summarization
-            logger.warning(
-                f"PDF multimodal path failed ({primary_error}). Falling back to text-only summarization."
-            )
-            text = _extract_text_from_pdf_bytes(pdf_bytes)
-            if not text:
-                raise
-            # Trim very large texts to keep token usage bounded
-            if len(text) > 200_000:
-                text = text[:200_000]
-            # Choose matching fallback prompt
-            base_prompt = _build_overview_prompt(title, page_count)
-            fallback_prompt = (
-                base_prompt
-                + "\n\nUse ONLY the extracted text below:\n\n[BEGIN EXTRACTED TEXT]\n"
-                + text
-                + "\n[END EXTRACTED TEXT]"
-            )
-            markdown_response = await model.generate_content_async(
-                fallback_prompt,
-                generation_config=FALLBACK_TEXT_GENERATION_CONFIG.copy(),
-            )
-            markdown_content = _normalize_markdown(markdown_response.text)
-            logger.info(
-                f"Generated markdown (fallback) length: {len(markdown_content)} characters"
-            )
-            return "", markdown_content, page_count
+        _OVERVIEW_CACHE.set(cache_key, markdown_content)
+        # Return empty string for raw_text since we're doing direct processing
+        return "", markdown_content, page_count
+    except Exception as primary_error:
+        # Windows pipe or multimodal upload path failed: fallback to text-only summarization
+        logger.warning(
+            "PDF multimodal path failed (%s). Falling back to text-only summarization.",
+            primary_error,
+        )
+        text = _extract_text_from_pdf_bytes(pdf_bytes)
+        if not text:
+            raise
+        # Trim very large texts to keep token usage bounded
+        text = _fit_fallback_text(text)
+        # Choose matching fallback prompt
+        base_prompt = _build_overview_prompt(title, page_count)
+        fallback_prompt = (
+            base_prompt
+            + "\n\nUse ONLY the extracted text below:\n\n[BEGIN EXTRACTED TEXT]\n"
+            + text
+            + "\n[END EXTRACTED TEXT]"
+        )
+        markdown_response = await model.generate_content_async(
+            fallback_prompt,
+            generation_config=FALLBACK_TEXT_GENERATION_CONFIG.copy(),
+        )
+        markdown_content = _normalize_markdown(markdown_response.text)
+        logger.info(
+            "Generated markdown (fallback) length: %d characters", len(markdown_content)
+        )
+        _OVERVIEW_CACHE.set(cache_key, markdown_content)
+        return "", markdown_content, page_count
+
+
+# Function to handle PDF files
+async def process_pdf_via_gemini(
+    pdf_path: str,
+    mode: str = "overview",
+    title: Optional[str] = None,
+    gemini_file: Optional[GeminiFileMetadata] = None,
+) -> Tuple[str, str, int]:
+    """
+    Process a PDF file directly to markdown through Gemini API.
 
+    Args:
+        pdf_path: Path to the PDF file
+        mode: "overview" for concise overview, "detailed" for full study guide
+        gemini_file: Optional Files API reference for the same PDF; when given the
+            request points at the uploaded file instead of inlining the bytes
+
+    Returns:
+        raw_text: Empty string (no longer extracted separately)
+        markdown_content: Direct markdown analysis of the PDF content
+        page_count: Number of pages in the PDF
+    """
+    try:
+        # Read, hash and count pages off the event loop; large PDFs take a while
+        pdf_bytes, digest, page_count = await asyncio.to_thread(_read_pdf_with_digest, pdf_path)
+        return await _overview_from_pdf_bytes(
+            pdf_bytes,
+            digest,
+            page_count,
+            mode=mode,
+            title=title,
+            gemini_file=gemini_file,
+        )
     except Exception as e:
-        logger.exception(f"Failed to process PDF directly via Gemini: {str(e)}")
+        logger.exception("Failed to process PDF directly via Gemini: %s", e)
         # Return empty results in case of failure
         return "", f"# Processing Failed\n\nError: {str(e)}", 0
 
@@ -239,10 +490,7 @@ async def process_office_doc_via_gemini(
         raise ValueError(f"Unsupported Office document type: {ext}")
 
     try:
-        with open(doc_path, "rb") as f:
-            doc_bytes = f.read()
-
-        page_count = get_office_page_count(doc_bytes, ext)
+        doc_bytes, page_count = await asyncio.to_thread(_read_office_doc, doc_path, ext)
         logger.info(
             "Processing Office document (%s) with ~%s pages via Gemini",
             ext,
@@ -257,32 +505,23 @@ async def process_office_doc_via_gemini(
                 document_bytes=doc_bytes,
                 filename=os.path.basename(doc_path) or f"document{ext}",
             )
-            converted_page_count: Optional[int]
+            # Work on the converted bytes directly: no temp-file round trip and one page count
             try:
-                converted_page_count = get_pdf_page_count_from_bytes(conversion.content)
-            except Exception:
-                logger.warning("Failed to derive page count from converted PDF; falling back to estimate.")
-                converted_page_count = None
-
-            tmp_pdf_path = None
-            with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as tmp_pdf:
-                tmp_pdf.write(conversion.content)
-                tmp_pdf_path = tmp_pdf.name
-            try:
-                _, markdown_content, pdf_page_count = await process_pdf_via_gemini(
-                    tmp_pdf_path,
+                converted_digest, converted_page_count = await asyncio.to_thread(
+                    _pdf_digest_and_page_count, conversion.content
+                )
+                _, markdown_content, _ = await _overview_from_pdf_bytes(
+                    conversion.content,
+                    converted_digest,
+                    converted_page_count,
                     mode=mode,
                     title=title,
                 )
-            finally:
-                if tmp_pdf_path:
-                    try:
-                        os.unlink(tmp_pdf_path)
-                    except OSError:
-                        pass
-
-            effective_pages = pdf_page_count or converted_page_count or page_count
-            return "", markdown_content, effective_pages
+            except Exception as e:
+                logger.exception("Failed to process converted PDF via Gemini: %s", e)
+                return "", f"# Processing Failed\n\nError: {str(e)}", page_count
+
+            return "", markdown_content, converted_page_count or page_count
         except GotenbergNotConfigured:
             logger.info("Gotenberg is not configured; using direct Office processing path.")
         except GotenbergConversionError as conversion_error:
@@ -314,6 +553,7 @@ async def process_office_doc_via_gemini(
             if ext == ".docx":
                 plain_text = extract_docx_text(doc_bytes)
                 if plain_text:
+                    plain_text = _fit_fallback_text(plain_text)
                     fallback_prompt = (
                         prompt
                         + "\n\nUse ONLY the extracted text below:\n\n[BEGIN EXTRACTED TEXT]\n"
@@ -335,6 +575,6 @@ async def process_office_doc_via_gemini(
         return "", "# Processing Failed\n\nAn error occurred while processing this document.", page_count
 
     except Exception as e:  # noqa: BLE001
-        logger.exception(f"Failed to process Office document via Gemini: {e}")
+        logger.exception("Failed to process Office document via Gemini: %s", e)
         return "", f"# Processing Failed\n\nError: {str(e)}", 0
 
@@ -1,3 +1,4 @@
+import asyncio
 import logging
 from contextlib import redirect_stdout, redirect_stderr
 from typing import Optional
@@ -10,15 +11,19 @@ from app.models.study_material import StudyMaterial as StudyMaterialModel
 from app.utils.enums import MaterialStatus
 from app.utils.processed_payload import set_overview_env, set_detailed_env, set_suggestions_env
 from app.services.material_processing_service.handle_material_processing import (
+    INLINE_IMAGE_MAX_BYTES,
     process_pdf_via_gemini,
     process_image_via_gemini,
     process_office_doc_via_gemini,
 )
 from app.services.material_processing_service.gemini_files import (
-    encode_gemini_file_metadata,
     get_or_refresh_gemini_file,
     is_supported_file_type,
 )
+from app.services.material_processing_service.gemini_helpers import (
+    gemini_file_column_values,
+    stored_gemini_file_metadata,
+)
 from app.services.ai_service.question_generator import generate_suggested_questions
 from app.services.ai_service.notes_service import (
     NoteGenerationVariant,
@@ -84,52 +89,79 @@ async def generate_light_overview(material_id: str) -> None:
 
                 backend = get_storage_backend()
                 obj_bytes = await backend.get_bytes(key=mat.file_path)
-                md = "# Overview Processing Failed\n\nUnsupported file type."
-                page_count = mat.page_count or 0
+                overview_title = mat.title or mat.file_name or "Overview"
 
-                gemini_metadata = None
-                if is_supported_file_type(mat.file_name or ""):
+                async def _prepare_gemini_file():
+                    if not is_supported_file_type(mat.file_name or ""):
+                        return None
                     try:
-                        gemini_metadata = await get_or_refresh_gemini_file(
+                        metadata = await get_or_refresh_gemini_file(
                             mat.content or "",
                             obj_bytes,
                             mat.file_name or "",
+                            stored=stored_gemini_file_metadata(mat),
                         )
                         logger.info(
                             "Gemini Files reference ready for material %s (expires %s)",
                             mat.id,
-                            gemini_metadata.expires_at,
+                            metadata.expires_at,
                         )
+                        return metadata
                     except Exception as exc:
                         logger.error("Failed to obtain Gemini Files reference: %s", exc)
-                        gemini_metadata = None
+                        return None
+
+                # Start the Files API upload now; the PDF overview reuses its URI
+                prepare_task = asyncio.create_task(_prepare_gemini_file())
+
+                async def _generate_overview():
+                    md = "# Overview Processing Failed\n\nUnsupported file type."
+                    page_count = mat.page_count or 0
 
-                # Write to temp file for processor
-                ext = os.path.splitext(mat.file_name or "")[1].lower() or ".bin"
-                with tempfile.NamedTemporaryFile(suffix=ext, delete=False) as tmp_file:
-                    tmp_file.write(obj_bytes)
-                    tmp_path = tmp_file.name
+                    # Write to temp file for processor
+                    ext = os.path.splitext(mat.file_name or "")[1].lower() or ".bin"
+                    with tempfile.NamedTemporaryFile(suffix=ext, delete=False) as tmp_file:
+                        tmp_file.write(obj_bytes)
+                        tmp_path = tmp_file.name
+
+                    try:
+                        if _is_pdf(mat.file_name or ""):
+                            _, md, page_count = await process_pdf_via_gemini(
+                                tmp_path,
+                                mode="overview",
+                                title=overview_title,
+                                gemini_file=await prepare_task,
+                            )
+                        elif _is_image(mat.file_name or ""):
+                            large_image = len(obj_bytes) > INLINE_IMAGE_MAX_BYTES
+                            _, md = await process_image_via_gemini(
+                                tmp_path,
+                                mode="overview",
+                                title=overview_title,
+                                gemini_file=await prepare_task if large_image else None,
+                            )
+                        elif _is_office(mat.file_name or ""):
+                            _, md, page_count = await process_office_doc_via_gemini(
+                                tmp_path, mode="overview", title=overview_title
+                            )
+                    finally:
+                        try:
+                            os.unlink(tmp_path)
+                        except Exception:
+                            pass
+                    return md, page_count
 
+                # Office and small-image overviews don't need the upload, so they run alongside it
                 try:
-                    if _is_pdf(mat.file_name or ""):
-                        _, md, page_count = await process_pdf_via_gemini(
-                            tmp_path, mode="overview", title=(mat.title or mat.file_name or "Overview")
-                        )
-                    elif _is_image(mat.file_name or ""):
-                        _, md = await process_image_via_gemini(
-                            tmp_path, mode="overview", title=(mat.title or mat.file_name or "Overview")
-                        )
-                    elif _is_office(mat.file_name or ""):
-                        _, md, page_count = await process_office_doc_via_gemini(
-                            tmp_path, mode="overview", title=(mat.title or mat.file_name or "Overview")
-                        )
-                    else:
-                        md = "# Overview Processing Failed\n\nUnsupported file type."
+                    gemini_metadata, (md, page_count) = await asyncio.gather(
+                        prepare_task,
+                        _generate_overview(),
+                    )
                 finally:
-                    try:
-                        os.unlink(tmp_path)
-                    except Exception:
-                        pass
+                    # gather() leaves siblings running when the overview fails; don't let
+                    # the upload outlive this session
+                    if not prepare_task.done():
+                        prepare_task.cancel()
 
                 # Generate AI-powered suggested questions (seamlessly during overview)
                 try:
@@ -154,14 +186,10 @@ async def generate_light_overview(material_id: str) -> None:
                         processed_content=new_payload,
                         page_count=page_count or mat.page_count,
                         status=MaterialStatus.completed,
-                        content=(
-                            encode_gemini_file_metadata(
-                                gemini_metadata.uri,
-                                gemini_metadata.expires_at,
-                                gemini_metadata.mime_type,
-                            )
+                        **(
+                            gemini_file_column_values(gemini_metadata)
                             if gemini_metadata
-                            else (mat.content or "")
+                            else {"content": mat.content or ""}
                         ),
                     )
                 )
@@ -212,6 +240,7 @@ async def generate_detailed_notes(material_id: str) -> None:
                                 mat.content or "",
                                 obj_bytes,
                                 mat.file_name or "",
+                                stored=stored_gemini_file_metadata(mat),
                             )
                         except Exception as exc:
                             logger.warning("Unable to prepare Gemini Files reference: %s", exc)
@@ -240,11 +269,7 @@ async def generate_detailed_notes(material_id: str) -> None:
                 }
 
                 if gemini_metadata:
-                    update_values["content"] = encode_gemini_file_metadata(
-                        gemini_metadata.uri,
-                        gemini_metadata.expires_at,
-                        gemini_metadata.mime_type,
-                    )
+                    update_values.update(gemini_file_column_values(gemini_metadata))
 
                 await session.execute(
                     update(StudyMaterialModel)
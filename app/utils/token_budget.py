@@ -0,0 +1,30 @@
+"""Token-budget helpers for trimming prompt context before it is sent to Gemini."""
+
+from __future__ import annotations
+
+# Gemini tokenizers average roughly four characters per token on English prose/markdown.
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Return an approximate Gemini token count for ``text``."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def truncate_to_token_budget(text: str, max_tokens: int) -> str:
+    """Trim ``text`` to roughly ``max_tokens`` tokens, preferring a clean boundary.
+
+    The cut lands on the last paragraph break (or line break) inside the budget so
+    the model never sees a half-finished sentence or markdown block. If no break
+    exists in the second half of the window, the text is cut at the raw limit.
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+
+    window = text[:max_chars]
+    for separator in ("\n\n", "\n"):
+        cut = window.rfind(separator)
+        if cut >= max_chars // 2:
+            return window[:cut].rstrip()
+    return window
@@ -0,0 +1,34 @@
+"""store Gemini file references in study material columns
+
+Revision ID: material_gemini_file_2025
+Revises: admin_broadcasts_2025
+Create Date: 2025-10-20 10:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "material_gemini_file_2025"
+down_revision = "admin_broadcasts_2025"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("study_materials", sa.Column("gemini_file_uri", sa.String(), nullable=True))
+    op.add_column("study_materials", sa.Column("gemini_file_expires_at", sa.DateTime(timezone=True), nullable=True))
+    op.add_column("study_materials", sa.Column("gemini_file_mime_type", sa.String(length=255), nullable=True))
+    op.create_index(
+        "ix_study_materials_gemini_file_expires_at",
+        "study_materials",
+        ["gemini_file_expires_at"],
+        unique=False,
+    )
+
+
+def downgrade():
+    op.drop_index("ix_study_materials_gemini_file_expires_at", table_name="study_materials")
+    op.drop_column("study_materials", "gemini_file_mime_type")
+    op.drop_column("study_materials", "gemini_file_expires_at")
+    op.drop_column("study_materials", "gemini_file_uri")
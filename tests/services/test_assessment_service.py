@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+import re
+
+import pytest
+
+from app.services.ai_service.assessment_service import parse_json_response, strip_json_fence
+
+# The regex strip_json_fence replaced; kept here to check the two agree
+_LEGACY_FENCE_RE = re.compile(r"```(?:json)?\s*(.*?)\s*(?:```|\Z)", re.DOTALL)
+
+
+def _legacy_strip_json_fence(text: str) -> str:
+    if "```" not in text:
+        return text
+    match = _LEGACY_FENCE_RE.search(text)
+    return match.group(1) if match else text
+
+
+@pytest.mark.parametrize(
+    ("text", "expected"),
+    [
+        ('```json\n{"questions": []}\n```', '{"questions": []}'),
+        ('Here you go:\n```json\n{"a": 1}\n```\nThanks!', '{"a": 1}'),
+        ('```\n{"a": 1}\n```', '{"a": 1}'),
+        ('```json\n{"a": 1}', '{"a": 1}'),
+        ('```\n{"a": 1}\n', '{"a": 1}'),
+        ('{"a": 1}', '{"a": 1}'),
+        ('  {"a": "no fence"}  ', '  {"a": "no fence"}  '),
+    ],
+)
+def test_strip_json_fence(text, expected):
+    assert strip_json_fence(text) == expected
+    assert strip_json_fence(text) == _legacy_strip_json_fence(text)
+
+
+def test_parse_json_response_reads_fenced_payload():
+    assert parse_json_response('```json\n{"questions": [{"question": "Q?"}]}\n```') == {
+        "questions": [{"question": "Q?"}]
+    }
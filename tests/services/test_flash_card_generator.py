@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from app.services.flash_cards.generator import _extract_json_span, _parse_response
+
+
+def _card(n: int, **overrides):
+    card = {
+        "prompt": f"Prompt {n}",
+        "correspondingInformation": f"Answer {n}. More detail.",
+        "hint": f"Hint {n}",
+    }
+    card.update(overrides)
+    return card
+
+
+def _deck(cards, **overrides):
+    deck = {"title": "Cells", "topic": "Biology", "difficulty": "medium", "cards": cards}
+    deck.update(overrides)
+    return deck
+
+
+@pytest.mark.parametrize(
+    ("text", "expected"),
+    [
+        ('{"a": 1}', '{"a": 1}'),
+        ('Sure! ```json\n{"a": {"b": 2}}\n``` done', '{"a": {"b": 2}}'),
+        ('{"a": "brace } inside"} trailing {"b": 2}', '{"a": "brace } inside"}'),
+        ('{"a": "escaped \\" quote }"}', '{"a": "escaped \\" quote }"}'),
+        ('{"a": 1', None),
+        ("no json here", None),
+    ],
+)
+def test_extract_json_span(text, expected):
+    assert _extract_json_span(text) == expected
+
+
+def test_parse_response_reads_plain_json():
+    deck = _parse_response(json.dumps(_deck([_card(i) for i in range(4)])), "Default", "easy", 10)
+
+    assert deck["title"] == "Cells"
+    assert deck["topic"] == "Biology"
+    assert deck["difficulty"] == "medium"
+    assert [card["prompt"] for card in deck["cards"]] == [f"Prompt {i}" for i in range(4)]
+
+
+def test_parse_response_salvages_wrapped_json():
+    text = "Here are your cards:\n```json\n" + json.dumps(_deck([_card(i) for i in range(3)])) + "\n```"
+
+    deck = _parse_response(text, "Default", "easy", 10)
+
+    assert len(deck["cards"]) == 3
+
+
+def test_parse_response_applies_defaults_limit_and_hint_fallback():
+    cards = [_card(0, hint=""), _card(1), _card(2), _card(3), {"prompt": "missing info"}]
+    text = json.dumps(_deck(cards, title="  ", topic="", difficulty="impossible"))
+
+    deck = _parse_response(text, "Default", "easy", 3)
+
+    assert deck["title"] == "Default"
+    assert deck["topic"] is None
+    assert deck["difficulty"] == "easy"
+    assert len(deck["cards"]) == 3
+    assert deck["cards"][0]["hint"] == "Answer 0."
+
+
+def test_parse_response_rejects_too_few_cards():
+    with pytest.raises(ValueError, match="too few"):
+        _parse_response(json.dumps(_deck([_card(0), _card(1)])), "Default", "easy", 10)
+
+
+def test_parse_response_rejects_non_object_payload():
+    with pytest.raises(ValueError, match="not a JSON object"):
+        _parse_response(json.dumps([_card(0)]), "Default", "easy", 10)
+
+
+def test_parse_response_raises_decode_error_when_nothing_recoverable():
+    with pytest.raises(json.JSONDecodeError):
+        _parse_response('{"title": "Cells", "cards": [', "Default", "easy", 10)
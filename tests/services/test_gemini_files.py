@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+
+import pytest
+
+from app.services.material_processing_service.gemini_files import (
+    GeminiFileMetadata,
+    decode_gemini_file_metadata,
+    encode_gemini_file_metadata,
+)
+
+URI = "https://generativelanguage.googleapis.com/v1beta/files/abc123"
+EXPIRES = datetime(2025, 10, 20, 12, 30, tzinfo=timezone.utc)
+
+
+@pytest.mark.parametrize(
+    ("content", "expected"),
+    [
+        (
+            f"gemini_file_uri:{URI}|expires:2025-10-20T12:30:00+00:00|mime:application/pdf",
+            GeminiFileMetadata(uri=URI, expires_at=EXPIRES, mime_type="application/pdf"),
+        ),
+        # Legacy rows: no mime section, naive UTC expiry
+        (
+            f"gemini_file_uri:{URI}|expires:2025-10-20T12:30:00",
+            GeminiFileMetadata(uri=URI, expires_at=EXPIRES, mime_type=None),
+        ),
+        (
+            f"gemini_file_uri:{URI}|expires:2025-10-20T12:30:00.000000+00:00",
+            GeminiFileMetadata(uri=URI, expires_at=EXPIRES, mime_type=None),
+        ),
+        (f"gemini_file_uri:{URI}|expires:next tuesday|mime:image/png", None),
+        (f"gemini_file_uri:{URI}", None),
+        (f"gemini_file_uri:{URI}|expires:2025-10-20T12:30:00+00:00" + "|x" * 300, None),
+        ("Extracted text that happens to mention gemini_file_uri:abc", None),
+        ("", None),
+    ],
+)
+def test_decode_gemini_file_metadata(content, expected):
+    assert decode_gemini_file_metadata(content) == expected
+
+
+def test_decode_returns_timezone_aware_expiry_for_naive_values():
+    decoded = decode_gemini_file_metadata(f"gemini_file_uri:{URI}|expires:2025-10-20T12:30:00")
+    assert decoded is not None
+    assert decoded.expires_at.tzinfo is not None
+
+
+@pytest.mark.parametrize("mime_type", ["application/pdf", None])
+def test_encode_decode_round_trip(mime_type):
+    encoded = encode_gemini_file_metadata(URI, EXPIRES, mime_type)
+    assert decode_gemini_file_metadata(encoded) == GeminiFileMetadata(
+        uri=URI,
+        expires_at=EXPIRES,
+        mime_type=mime_type,
+    )
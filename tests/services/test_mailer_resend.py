@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import json
+from typing import Callable, List
+
+import httpx
+import pytest
+
+from app.services.mail_handler_service import mailer_resend
+from app.services.mail_handler_service.mailer_resend import EmailError
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture()
+def resend_requests(monkeypatch):
+    """Route the pooled Resend client through a MockTransport; yields (requests, set_handler)."""
+    requests: List[httpx.Request] = []
+    handler: List[Callable[[httpx.Request], httpx.Response]] = [
+        lambda request: httpx.Response(200, json={"id": "email_1"})
+    ]
+
+    def _dispatch(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return handler[0](request)
+
+    client = httpx.AsyncClient(
+        base_url=mailer_resend.RESEND_API_URL,
+        transport=httpx.MockTransport(_dispatch),
+    )
+    monkeypatch.setattr(mailer_resend, "_client", client)
+
+    def set_handler(fn: Callable[[httpx.Request], httpx.Response]) -> None:
+        handler[0] = fn
+
+    yield requests, set_handler
+
+
+async def test_send_email_posts_payload_with_idempotency_key(resend_requests):
+    requests, _ = resend_requests
+
+    result = await mailer_resend.send_email(
+        subject="Hi",
+        recipient="user@example.com",
+        html_content="<p>Hi</p>",
+        body="Hi",
+        sender="noreply@example.com",
+        tags={"type": "test"},
+        idempotency_key="payment_success/inv_1",
+    )
+
+    assert result == {"id": "email_1"}
+    (request,) = requests
+    assert request.method == "POST"
+    assert request.url.path == "/emails"
+    assert request.headers["Idempotency-Key"] == "payment_success/inv_1"
+    assert json.loads(request.content) == {
+        "from": "noreply@example.com",
+        "to": ["user@example.com"],
+        "subject": "Hi",
+        "html": "<p>Hi</p>",
+        "text": "Hi",
+        "tags": [{"name": "type", "value": "test"}],
+    }
+
+
+async def test_send_email_omits_idempotency_header_without_key(resend_requests):
+    requests, _ = resend_requests
+
+    await mailer_resend.send_email(subject="Hi", recipient="user@example.com", sender="a@example.com")
+
+    assert "Idempotency-Key" not in requests[0].headers
+
+
+async def test_send_batch_chunks_messages_with_per_chunk_keys(resend_requests):
+    requests, set_handler = resend_requests
+    set_handler(
+        lambda request: httpx.Response(
+            200,
+            json={"data": [{"id": f"email_{message['to'][0]}"} for message in json.loads(request.content)]},
+        )
+    )
+    count = mailer_resend.RESEND_BATCH_LIMIT + 1
+    messages = [
+        {"subject": "Hi", "recipient": f"user{i}@example.com", "sender": "a@example.com"}
+        for i in range(count)
+    ]
+
+    results = await mailer_resend.send_batch(messages, idempotency_key="run-1")
+
+    assert [request.url.path for request in requests] == ["/emails/batch", "/emails/batch"]
+    assert [request.headers["Idempotency-Key"] for request in requests] == ["run-1/0", "run-1/1"]
+    assert [len(json.loads(request.content)) for request in requests] == [count - 1, 1]
+    assert results == [{"id": f"email_user{i}@example.com"} for i in range(count)]
+
+
+@pytest.mark.parametrize(
+    ("response", "message_fragment"),
+    [
+        (httpx.Response(422, json={"message": "Invalid `to` field"}), "Resend API error (422)"),
+        (httpx.Response(500, text="upstream down"), "Resend API error (500)"),
+        (httpx.Response(200, json={}), "no email ID returned"),
+    ],
+)
+async def test_send_email_maps_failures_to_email_error(resend_requests, response, message_fragment):
+    _, set_handler = resend_requests
+    set_handler(lambda request: response)
+
+    with pytest.raises(EmailError) as exc_info:
+        await mailer_resend.send_email(subject="Hi", recipient="user@example.com", sender="a@example.com")
+
+    assert message_fragment in str(exc_info.value)
+    assert exc_info.value.user_message
+
+
+async def test_transport_errors_map_to_email_error(resend_requests):
+    _, set_handler = resend_requests
+
+    def _fail(request: httpx.Request) -> httpx.Response:
+        raise httpx.ConnectError("connection refused", request=request)
+
+    set_handler(_fail)
+
+    with pytest.raises(EmailError, match="Failed to send email"):
+        await mailer_resend.send_email(subject="Hi", recipient="user@example.com", sender="a@example.com")
+
+
+async def test_send_batch_rejects_response_without_data(resend_requests):
+    _, set_handler = resend_requests
+    set_handler(lambda request: httpx.Response(200, json={"id": "not-a-batch"}))
+
+    with pytest.raises(EmailError, match="no email IDs returned"):
+        await mailer_resend.send_batch(
+            [{"subject": "Hi", "recipient": "user@example.com", "sender": "a@example.com"}]
+        )
+
+
+async def test_aclose_client_closes_pooled_client(resend_requests):
+    client = mailer_resend._get_client()
+
+    await mailer_resend.aclose_client()
+
+    assert client.is_closed
+    assert mailer_resend._client is None
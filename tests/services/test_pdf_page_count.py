@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+from typing import Dict, Optional
+
+from app.services.material_processing_service import handle_material_processing
+from app.services.material_processing_service.handle_material_processing import (
+    _scan_pdf_page_count,
+    get_pdf_page_count_from_bytes,
+)
+
+
+def _append_revision(
+    data: bytes,
+    objects: Dict[int, bytes],
+    *,
+    size: int,
+    prev: Optional[int] = None,
+) -> bytes:
+    """Append ``objects`` plus a classic xref table and trailer to ``data``."""
+    out = bytearray(data)
+    offsets = {}
+    for number, body in objects.items():
+        offsets[number] = len(out)
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+
+    xref_pos = len(out)
+    out += b"xref\n"
+    if prev is None:
+        out += b"0 1\n0000000000 65535 f\r\n"
+    for number, offset in offsets.items():
+        out += b"%d 1\n%010d 00000 n\r\n" % (number, offset)
+    trailer = b"/Size %d /Root 1 0 R" % size
+    if prev is not None:
+        trailer += b" /Prev %d" % prev
+    out += b"trailer\n<< " + trailer + b" >>\nstartxref\n%d\n%%%%EOF\n" % xref_pos
+    return bytes(out)
+
+
+def _last_xref(data: bytes) -> int:
+    return int(data.rsplit(b"startxref", 1)[1].split()[0])
+
+
+def _plain_pdf(page_count: int) -> bytes:
+    kids = b" ".join(b"%d 0 R" % (3 + i) for i in range(page_count))
+    objects = {
+        1: b"<< /Type /Catalog /Pages 2 0 R >>",
+        2: b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % page_count,
+    }
+    for i in range(page_count):
+        objects[3 + i] = b"<< /Type /Page /Parent 2 0 R >>"
+    return _append_revision(b"%PDF-1.4\n", objects, size=3 + page_count)
+
+
+def test_plain_pdf_reads_root_count():
+    assert _scan_pdf_page_count(_plain_pdf(3)) == 3
+
+
+def test_incremental_update_uses_latest_page_tree():
+    base = _plain_pdf(3)
+    # The update drops a page: the older /Count 3 tree is still in the bytes
+    updated = _append_revision(
+        base,
+        {2: b"<< /Type /Pages /Kids [3 0 R 4 0 R] /Count 2 >>"},
+        size=6,
+        prev=_last_xref(base),
+    )
+    assert _scan_pdf_page_count(updated) == 2
+
+
+def test_object_stream_pdf_is_left_to_the_parser():
+    # PDF 1.5 cross-reference stream: no classic xref table to resolve through
+    data = (
+        b"%PDF-1.5\n"
+        b"1 0 obj\n<< /Type /ObjStm /N 2 /First 10 /Length 0 >>\nstream\n\nendstream\nendobj\n"
+        b"2 0 obj\n<< /Type /XRef /Size 3 /Root 3 0 R /W [1 2 1] /Length 0 >>\nstream\n\nendstream\nendobj\n"
+    )
+    data += b"startxref\n%d\n%%%%EOF\n" % data.index(b"2 0 obj")
+    assert _scan_pdf_page_count(data) is None
+
+
+def test_embedded_file_page_tree_is_ignored():
+    embedded = _plain_pdf(50)
+    objects = {
+        1: b"<< /Type /Catalog /Pages 2 0 R /Names << /EmbeddedFiles 5 0 R >> >>",
+        2: b"<< /Type /Pages /Kids [3 0 R 4 0 R] /Count 2 >>",
+        3: b"<< /Type /Page /Parent 2 0 R >>",
+        4: b"<< /Type /Page /Parent 2 0 R >>",
+        5: b"<< /Names [(doc.pdf) 6 0 R] >>",
+        6: b"<< /Type /EmbeddedFile /Length %d >>\nstream\n" % len(embedded)
+        + embedded
+        + b"\nendstream",
+    }
+    data = _append_revision(b"%PDF-1.4\n", objects, size=7)
+    assert _scan_pdf_page_count(data) == 2
+
+
+def test_indirect_count_is_left_to_the_parser(monkeypatch):
+    objects = {
+        1: b"<< /Type /Catalog /Pages 2 0 R >>",
+        2: b"<< /Type /Pages /Kids [3 0 R 4 0 R 5 0 R] /Count 15 0 R >>",
+        3: b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 100 100] >>",
+        4: b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 100 100] >>",
+        5: b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 100 100] >>",
+        15: b"3",
+    }
+    data = _append_revision(b"%PDF-1.4\n", objects, size=16)
+
+    assert _scan_pdf_page_count(data) is None
+
+    monkeypatch.setattr(handle_material_processing, "FITZ_AVAILABLE", False)
+    assert get_pdf_page_count_from_bytes(data) == 3
+
+
+def test_non_pdf_bytes_return_none():
+    assert _scan_pdf_page_count(b"not a pdf") is None
@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.ai_service import tutoring_service
+from app.services.ai_service.tutoring_service import _GREETING_ONLY_RE, answer_with_file
+from app.utils.ttl_cache import TTLCache
+
+
+@pytest.mark.parametrize(
+    "question",
+    [
+        "hi",
+        "Hello!",
+        "  hey  ",
+        "yo",
+        "Who are you?",
+        "what can you do",
+        "What can you help with?",
+        "what can you help me",
+    ],
+)
+def test_greeting_only_questions_match(question):
+    assert _GREETING_ONLY_RE.match(question)
+
+
+@pytest.mark.parametrize(
+    "question",
+    [
+        "What can you help me understand about entropy?",
+        "what can you do with chapter 3 integrals?",
+        "What can you help with in this PDF regarding eigenvalues",
+        "hi, can you explain photosynthesis?",
+        "Who are you citing in section 2?",
+    ],
+)
+def test_study_questions_do_not_match(question):
+    assert not _GREETING_ONLY_RE.match(question)
+
+
+class _GatedModel:
+    """Fake Gemini client that holds every call until ``release`` is set."""
+
+    def __init__(self, *, fail: bool = False):
+        self.calls = 0
+        self.fail = fail
+        self.release = asyncio.Event()
+
+    async def generate_content_async(self, parts, **kwargs):
+        self.calls += 1
+        await self.release.wait()
+        if self.fail:
+            raise RuntimeError("Gemini unavailable")
+        return SimpleNamespace(text="Mitochondria make ATP.")
+
+
+@pytest.fixture()
+def fake_model(monkeypatch):
+    def _install(**kwargs) -> _GatedModel:
+        model = _GatedModel(**kwargs)
+        monkeypatch.setattr(tutoring_service, "get_gemini_model", lambda **_: model)
+        monkeypatch.setattr(tutoring_service, "_ANSWER_CACHE", TTLCache(maxsize=8, ttl=60))
+        monkeypatch.setattr(tutoring_service, "_INFLIGHT", {})
+        return model
+
+    return _install
+
+
+async def _ask_twice_concurrently(model: _GatedModel, question: str):
+    first = asyncio.create_task(answer_with_file(question))
+    second = asyncio.create_task(answer_with_file(question))
+    # Let both requests reach the model / in-flight table before releasing the call
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    model.release.set()
+    return await asyncio.gather(first, second)
+
+
+@pytest.mark.anyio
+async def test_concurrent_identical_questions_share_one_call(fake_model):
+    model = fake_model()
+
+    first, second = await _ask_twice_concurrently(model, "What do mitochondria do?")
+
+    assert model.calls == 1
+    assert first == second == {"answer": "Mitochondria make ATP."}
+
+
+@pytest.mark.anyio
+async def test_concurrent_failure_shares_fallback_and_is_not_cached(fake_model):
+    model = fake_model(fail=True)
+
+    first, second = await _ask_twice_concurrently(model, "What do mitochondria do?")
+
+    assert model.calls == 1
+    assert first == second
+    assert first["answer"].startswith("# Technical Difficulty")
+    assert "What do mitochondria do?" in first["answer"]
+
+    # The fallback is not cached: the next ask goes back to Gemini
+    await answer_with_file("What do mitochondria do?")
+    assert model.calls == 2
@@ -0,0 +1,30 @@
+from __future__ import annotations
+
+from app.utils import ttl_cache
+from app.utils.ttl_cache import TTLCache
+
+
+def test_get_returns_default_after_expiry(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(ttl_cache.time, "monotonic", lambda: now[0])
+
+    cache: TTLCache[str] = TTLCache(maxsize=4, ttl=10)
+    cache.set("k", "v")
+    assert cache.get("k") == "v"
+
+    now[0] += 11
+    assert cache.get("k") is None
+    assert len(cache) == 0
+
+
+def test_evicts_least_recently_used_entry():
+    cache: TTLCache[int] = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # refresh "a" so "b" is now the oldest
+
+    cache.set("c", 3)
+
+    assert "b" not in cache
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3